@@ -1,9 +1,10 @@
 from flask import Flask
 from flask_cors import CORS
-from .extensions import db, cache, jwt, mail
+from .extensions import db, cache, jwt, mail, bcrypt
+from . import hashing, last_login, migrations, discovery, search, dashboard, cache_tags, mailer, reports
 from .config import Config
 from .models import Users
-# from .routes import main as main_blueprint, auth as auth_blueprint
+from .routes import main as main_blueprint
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
@@ -13,10 +14,23 @@ def create_app():
     cache.init_app(app)
     mail.init_app(app)
     jwt.init_app(app)
+    bcrypt.init_app(app)
+    hashing.init_app(app)
+    last_login.init_app(app)
+    migrations.init_app(app)
+    discovery.init_app(app)
+    search.init_app(app)
+    dashboard.init_app(app)
+    mailer.init_app(app)
+    reports.init_app(app)
     CORS(app, supports_credentials=True)
+    app.register_blueprint(main_blueprint)
 
     with app.app_context():
         db.create_all()
+        migrations.upgrade_columns()
+        migrations.upgrade_indexes()
+        search.campaign_search.setup()
         create_admin_user()
 
     return app
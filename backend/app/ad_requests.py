@@ -0,0 +1,93 @@
+from sqlalchemy import insert, select
+from .extensions import db
+from .models import Influencers, Campaigns, AdRequests
+
+class AdRequestError(Exception):
+    def __init__(self, message, status = 400):
+        super().__init__(message)
+        self.status = status
+
+def _amount(value):
+    try:
+        amount = float(value)
+    except (TypeError, ValueError):
+        return None
+    return amount if amount > 0 else None
+
+def send_requests(sponsor_id, campaign_id, items, defaults = None):
+    '''
+    Sends one ad request per item ({influencer_id, message, requirements,
+    payment_amount}, missing fields taken from `defaults`). Influencers are
+    resolved with one IN query, existing campaign/influencer pairs with
+    another, and all new rows go out in a single INSERT. Returns one result
+    per influencer in input order; invalid items are skipped, not fatal.
+    '''
+    campaign = db.session.execute(
+        select(Campaigns.id, Campaigns.sponsor_id).where(Campaigns.id == campaign_id)
+    ).first()
+    if campaign is None:
+        raise AdRequestError('Campaign not found.', 404)
+    if campaign.sponsor_id != sponsor_id:
+        raise AdRequestError('You are not authorised to send requests for this campaign.', 403)
+
+    defaults = defaults or {}
+    results = []
+    candidates = []
+    for item in items:
+        item = {**defaults, **item} if isinstance(item, dict) else {**defaults, 'influencer_id': item}
+        result = {'influencer_id': item.get('influencer_id')}
+        results.append(result)
+        try:
+            result['influencer_id'] = int(item.get('influencer_id'))
+        except (TypeError, ValueError):
+            result.update(status = 'failed', error = 'Invalid influencer id.')
+            continue
+        message = (item.get('message') or '').strip()
+        requirements = (item.get('requirements') or '').strip()
+        payment_amount = _amount(item.get('payment_amount'))
+        if not message or not requirements or payment_amount is None:
+            result.update(status = 'failed', error = 'message, requirements and a positive payment_amount are required.')
+            continue
+        candidates.append((result, {
+            'sent_by': 'sponsor', 'sender_id': sponsor_id, 'receiver_id': result['influencer_id'],
+            'campaign_id': campaign_id, 'message': message, 'requirements': requirements,
+            'payment_amount': payment_amount, 'status': 'pending'
+        }))
+
+    influencer_ids = {row['receiver_id'] for _, row in candidates}
+    found = set(db.session.scalars(select(Influencers.id).where(Influencers.id.in_(influencer_ids)))) if influencer_ids else set()
+    existing = set(db.session.scalars(
+        select(AdRequests.receiver_id).where(AdRequests.campaign_id == campaign_id, AdRequests.receiver_id.in_(influencer_ids))
+    )) if influencer_ids else set()
+
+    pending = []
+    for result, row in candidates:
+        influencer_id = row['receiver_id']
+        if influencer_id not in found:
+            result.update(status = 'failed', error = f'Influencer with ID {influencer_id} not found.')
+        elif influencer_id in existing:
+            result.update(status = 'skipped', error = 'Request already exists between this campaign and influencer.')
+        else:
+            existing.add(influencer_id)
+            pending.append((result, row))
+
+    if pending:
+        # RETURNING the receiver too keeps this a single batched INSERT; asking
+        # for rows back in parameter order would make SQLite insert row by row.
+        try:
+            tags = [f'ad_requests:user:{user_id}' for user_id in {sponsor_id, *(row['receiver_id'] for _, row in pending)}]
+            inserted = db.session.execute(
+                insert(AdRequests).returning(AdRequests.id, AdRequests.receiver_id),
+                [row for _, row in pending],
+                execution_options = {'cache_tags': tags}
+            )
+            request_ids = {receiver_id: request_id for request_id, receiver_id in inserted}
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        for result, row in pending:
+            result.update(status = 'sent', request_id = request_ids[row['receiver_id']])
+
+    counts = {status: sum(1 for result in results if result['status'] == status) for status in ('sent', 'skipped', 'failed')}
+    return {**counts, 'results': results}
@@ -0,0 +1,132 @@
+import hashlib
+from uuid import uuid4
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+from .extensions import cache
+from .models import Users, Influencers, InfluencerPlatform, Campaigns, AdRequests, JoinedInfluencers, EarningsLedger
+
+TAG_PREFIX = 'tag:'
+
+def _expand(tag):
+    # Every owner tag ('campaigns:sponsor:42') also depends on its model's
+    # wildcard tag ('campaigns:*'), which is bumped by bulk writes whose
+    # owners are unknown.
+    return [tag, f'{tag.split(":", 1)[0]}:*']
+
+def tag_versions(*tags):
+    '''
+    Current version token of each tag. A tag with no version yet (or one the
+    backend evicted) gets a fresh random token, which only ever makes cached
+    entries look stale, never fresh.
+    '''
+    names = sorted({name for tag in tags for name in _expand(tag)})
+    keys = [TAG_PREFIX + name for name in names]
+    versions = dict(zip(names, cache.get_many(*keys)))
+    missing = {TAG_PREFIX + name: uuid4().hex for name, version in versions.items() if version is None}
+    if missing:
+        for key, version in missing.items():
+            if not cache.add(key, version, timeout = 0):
+                missing[key] = cache.get(key) or version
+        versions.update({key[len(TAG_PREFIX):]: version for key, version in missing.items()})
+    return versions
+
+def tags_digest(*tags, extra = ()):
+    '''Changes whenever any of the tags is invalidated (or extra changes).'''
+    versions = tag_versions(*tags)
+    parts = [*(f'{name}={versions[name]}' for name in sorted(versions)), *map(str, extra)]
+    return hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+def tagged_key(key, *tags):
+    return f'{key}@{tags_digest(*tags)[:16]}'
+
+def cached(key, tags, compute, timeout = None):
+    '''Returns the cached value for key under the current versions of tags, computing it on a miss.'''
+    full_key = tagged_key(key, *tags)
+    value = cache.get(full_key)
+    if value is None:
+        value = compute()
+        cache.set(full_key, value, timeout = timeout)
+    return value
+
+def invalidate(*tags):
+    if tags:
+        cache.set_many({TAG_PREFIX + tag: uuid4().hex for tag in set(tags)}, timeout = 0)
+
+def touch(session, *tags):
+    '''Marks tags for invalidation once the session's transaction commits.'''
+    session.info.setdefault('cache_tags', set()).update(tags)
+
+def _sponsor_of_campaign(session, campaign_id):
+    if campaign_id is None:
+        return None
+    return session.connection().scalar(select(Campaigns.sponsor_id).where(Campaigns.id == campaign_id))
+
+def _values(instance, attribute):
+    history = inspect(instance).attrs[attribute].history
+    return {value for value in (*history.deleted, getattr(instance, attribute)) if value is not None}
+
+def tags_for(session, instance):
+    if isinstance(instance, Campaigns):
+        return {'campaigns:all', *(f'campaigns:sponsor:{sponsor_id}' for sponsor_id in _values(instance, 'sponsor_id'))}
+    if isinstance(instance, AdRequests):
+        users = _values(instance, 'sender_id') | _values(instance, 'receiver_id')
+        return {f'ad_requests:user:{user_id}' for user_id in users}
+    if isinstance(instance, JoinedInfluencers):
+        sponsor_id = _sponsor_of_campaign(session, instance.campaign_id)
+        return {'campaigns:all'} if sponsor_id is None else {'campaigns:all', f'campaigns:sponsor:{sponsor_id}'}
+    if isinstance(instance, EarningsLedger):
+        return {f'earnings:influencer:{instance.influencer_id}'}
+    if isinstance(instance, InfluencerPlatform):
+        return {'influencers:all'}
+    if isinstance(instance, Users):
+        tags = {'users:all', f'users:{instance.id}'}
+        if isinstance(instance, Influencers):
+            tags.add('influencers:all')
+        return tags
+    return set()
+
+@event.listens_for(Session, 'after_flush')
+def _collect_cache_tags(session, flush_context):
+    tags = set()
+    for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+        tags |= tags_for(session, instance)
+    touch(session, *tags)
+
+WILDCARD_TAGS = {
+    Users: ('users:*',),
+    Influencers: ('users:*', 'influencers:*'),
+    InfluencerPlatform: ('influencers:*',),
+    Campaigns: ('campaigns:*',),
+    JoinedInfluencers: ('campaigns:*',),
+    AdRequests: ('ad_requests:*',),
+    EarningsLedger: ('earnings:*',),
+}
+
+def wildcard_tags(model):
+    for cls in model.__mro__:
+        if cls in WILDCARD_TAGS:
+            return WILDCARD_TAGS[cls]
+    return ()
+
+@event.listens_for(Session, 'do_orm_execute')
+def _collect_bulk_cache_tags(orm_execute_state):
+    '''
+    Bulk statements don't go through the flush. Callers that know which
+    owners they touch pass them as execution_options(cache_tags = [...]);
+    any other ORM bulk statement invalidates its model's wildcard tag.
+    '''
+    if orm_execute_state.is_select:
+        return
+    tags = orm_execute_state.execution_options.get('cache_tags')
+    if tags is None and orm_execute_state.bind_mapper is not None:
+        tags = wildcard_tags(orm_execute_state.bind_mapper.class_)
+    if tags:
+        touch(orm_execute_state.session, *tags)
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_cache_tags(session):
+    invalidate(*session.info.pop('cache_tags', ()))
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_cache_tags(session):
+    session.info.pop('cache_tags', None)
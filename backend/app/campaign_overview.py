@@ -0,0 +1,75 @@
+from datetime import datetime
+from sqlalchemy import DateTime, Float, case, func, literal, select
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+from .extensions import db
+from .models import Campaigns, Influencers, JoinedInfluencers
+from .serializers import columns
+
+class day_number(FunctionElement):
+    '''A timestamp as a fractional day count, so dates can be subtracted on any database.'''
+    type = Float()
+    name = 'day_number'
+    inherit_cache = True
+
+@compiles(day_number)
+def _day_number(element, compiler, **kw):
+    return f'(EXTRACT(EPOCH FROM {compiler.process(element.clauses, **kw)}) / 86400.0)'
+
+@compiles(day_number, 'sqlite')
+def _day_number_sqlite(element, compiler, **kw):
+    return f'julianday({compiler.process(element.clauses, **kw)})'
+
+@compiles(day_number, 'mysql')
+def _day_number_mysql(element, compiler, **kw):
+    return f'(UNIX_TIMESTAMP({compiler.process(element.clauses, **kw)}) / 86400.0)'
+
+def overview_columns():
+    '''
+    Progress and state computed in SQL from the campaign dates. Dates are
+    stored as local time, so "now" is the app's local time sent as a
+    parameter rather than the database clock.
+    '''
+    now = day_number(literal(datetime.now(), DateTime))
+    start, end = day_number(Campaigns.start_date), day_number(Campaigns.end_date)
+    total_days = end - start
+    progress = case(
+        (total_days <= 0, 0),
+        (now <= start, 0),
+        (now >= end, 100),
+        else_ = (now - start) * 100.0 / total_days
+    )
+    state = case((now < start, 'upcoming'), (now >= end, 'completed'), else_ = 'active')
+
+    joined_count = (
+        select(func.count(JoinedInfluencers.id))
+        .where(JoinedInfluencers.campaign_id == Campaigns.id)
+        .correlate(Campaigns)
+        .scalar_subquery()
+    )
+    return [func.round(progress, 1).label('progress'), state.label('state'), joined_count.label('joined_count')]
+
+def overview_select(*criteria):
+    return select(*columns(Campaigns), *overview_columns()).where(*criteria)
+
+def joined_influencers(campaign_ids):
+    '''Names of joined influencers for a whole page of campaigns in one query.'''
+    names = {campaign_id: [] for campaign_id in campaign_ids}
+    if not names:
+        return names
+    rows = db.session.execute(
+        select(JoinedInfluencers.campaign_id, Influencers.id, Influencers.first_name, Influencers.last_name)
+        .join(Influencers, Influencers.user_id == JoinedInfluencers.user_id)
+        .where(JoinedInfluencers.campaign_id.in_(names))
+        .order_by(JoinedInfluencers.campaign_id, JoinedInfluencers.id)
+    )
+    for campaign_id, influencer_id, first_name, last_name in rows:
+        names[campaign_id].append({'id': influencer_id, 'name': f'{first_name} {last_name}'})
+    return names
+
+def overview_dicts(rows):
+    campaigns = [row._asdict() for row in rows]
+    joined = joined_influencers([campaign['id'] for campaign in campaigns])
+    for campaign in campaigns:
+        campaign['joined_influencers'] = joined[campaign['id']]
+    return campaigns
@@ -0,0 +1,85 @@
+import hashlib
+import json
+import os
+import time
+from .dashboard import get_snapshot, summarize
+
+# Bump when the drawing code changes so existing PNGs are not reused.
+CHART_STYLE_VERSION = 1
+# Seconds a queued render covers the same missing charts before polls queue another.
+RENDER_REQUEST_TTL = 60
+
+CHARTS = {
+    'sponsors_by_industry': 'Sponsors by industry',
+    'influencers_by_industry': 'Influencers by industry',
+    'campaigns_by_industry': 'Campaigns by industry',
+    'flagged': 'Flagged accounts and campaigns',
+}
+
+def chart_data(summary):
+    '''Label -> count series for every chart, from the dashboard aggregates.'''
+    data = {name: dict(sorted(summary[name].items())) for name in CHARTS if name != 'flagged'}
+    data['flagged'] = {kind: summary[f'flagged_{kind}_count'] for kind in ('sponsors', 'influencers', 'campaigns')}
+    return data
+
+def chart_digest(name, series):
+    '''Content address of a chart: changes only when its data (or style) does.'''
+    payload = json.dumps([CHART_STYLE_VERSION, name, series], sort_keys = True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+def chart_path(chart_dir, digest):
+    return os.path.join(chart_dir, f'{digest}.png')
+
+def current_charts(chart_dir):
+    '''{name: (digest, rendered)} for the current aggregates; no rendering.'''
+    charts = {}
+    for name, series in chart_data(summarize(get_snapshot())).items():
+        digest = chart_digest(name, series)
+        charts[name] = (digest, os.path.exists(chart_path(chart_dir, digest)))
+    return charts
+
+def _draw(title, series):
+    # Imported here so web workers never load matplotlib; the Agg canvas
+    # renders straight to PNG without touching pyplot or a GUI backend.
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize = (8, 4.5), dpi = 100)
+    FigureCanvasAgg(figure)
+    axes = figure.subplots()
+    labels, values = list(series), list(series.values())
+    axes.bar(labels, values, color = '#26424f')
+    axes.set_title(title)
+    axes.set_ylabel('Count')
+    axes.tick_params(axis = 'x', labelrotation = 30)
+    for label in axes.get_xticklabels():
+        label.set_horizontalalignment('right')
+    figure.tight_layout()
+    return figure
+
+def render_charts(chart_dir):
+    '''
+    Renders the charts whose data changed since they were last drawn and
+    returns the names rendered. Files are written under a temporary name and
+    renamed, so a chart is either complete or absent.
+    '''
+    os.makedirs(chart_dir, exist_ok = True)
+    rendered, current = [], set()
+    for name, series in chart_data(summarize(get_snapshot())).items():
+        path = chart_path(chart_dir, chart_digest(name, series))
+        current.add(path)
+        if os.path.exists(path):
+            continue
+        partial = f'{path}.{os.getpid()}.part'
+        _draw(CHARTS[name], series).savefig(partial, format = 'png')
+        os.replace(partial, path)
+        rendered.append(name)
+    prune_charts(chart_dir, keep = current)
+    return rendered
+
+def prune_charts(chart_dir, keep, older_than = 3600):
+    '''Removes superseded charts once they are older than an hour.'''
+    cutoff = time.time() - older_than
+    for entry in os.scandir(chart_dir):
+        if entry.name.endswith('.png') and entry.path not in keep and entry.stat().st_mtime < cutoff:
+            os.remove(entry.path)
@@ -0,0 +1,23 @@
+from flask import Response, request
+from .cache_tags import tags_digest
+
+def listing_etag(scope, *tags, extra = ()):
+    '''
+    Strong ETag for a listing: the tag versions of the owners it depends on
+    plus the request's query string (page, cursor, limit). Computing it costs
+    one cache round trip and no database query.
+    '''
+    return tags_digest(*tags, extra = (scope, request.query_string.decode(), *extra))
+
+def conditional_response(etag, build):
+    '''
+    Answers 304 without calling build() when If-None-Match already holds
+    etag; otherwise build() produces the full response.
+    '''
+    if request.if_none_match.contains(etag):
+        response = Response(status = 304)
+    else:
+        response = build()
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
@@ -1,13 +1,55 @@
 import os
+import tempfile
 
 class Config:
     SECRET_KEY = os.getenv('SECRET_KEY', 'your_secret_key')
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URI', 'sqlite:///iescp.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'your_jwt_secret_key')
-    CACHE_TYPE = 'simple'
-    MAIL_SERVER = 'smtp.example.com'
-    MAIL_PORT = 587
-    MAIL_USE_TLS = True
+    # Token identities are dicts ({'id', 'role', 'approved'}), not string subjects.
+    JWT_VERIFY_SUB = False
+    BCRYPT_LOG_ROUNDS = int(os.getenv('BCRYPT_LOG_ROUNDS', 12))
+    HASHING_WORKERS = int(os.getenv('HASHING_WORKERS', 4))
+    HASHING_QUEUE_DEPTH = int(os.getenv('HASHING_QUEUE_DEPTH', 32))
+    HASHING_TIMEOUT = 10
+    LAST_LOGIN_FLUSH_INTERVAL = int(os.getenv('LAST_LOGIN_FLUSH_INTERVAL', 30))
+    LAST_LOGIN_FLUSH_SIZE = int(os.getenv('LAST_LOGIN_FLUSH_SIZE', 500))
+    # How Sponsors/Influencers columns are loaded when querying Users: 'selectin'
+    # (one extra SELECT per subtype) or 'inline' (LEFT OUTER JOINs in the same query).
+    POLYMORPHIC_LOADING = os.getenv('POLYMORPHIC_LOADING', 'selectin')
+    PAGE_SIZE_DEFAULT = 50
+    PAGE_SIZE_MAX = 500
+    DISCOVERY_INDEX_TTL = int(os.getenv('DISCOVERY_INDEX_TTL', 300))
+    DASHBOARD_SNAPSHOT_TTL = int(os.getenv('DASHBOARD_SNAPSHOT_TTL', 600))
+    EARNINGS_LEDGER_RETENTION_DAYS = int(os.getenv('EARNINGS_LEDGER_RETENTION_DAYS', 30))
+    # Celery needs a result backend as well as a broker: the reminder and report
+    # fan-outs are chords whose summary task waits on every chunk's result.
+    CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', 'redis://localhost:6379/0')
+    CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND', 'redis://localhost:6379/1')
+    REMINDER_CHUNK_SIZE = int(os.getenv('REMINDER_CHUNK_SIZE', 200))
+    REPORT_SHARD_SIZE = int(os.getenv('REPORT_SHARD_SIZE', 100))
+    # A report still claimed but unsent after this many seconds was interrupted mid-send.
+    REPORT_CLAIM_TIMEOUT = int(os.getenv('REPORT_CLAIM_TIMEOUT', 3600))
+    EXPORT_DIR = os.getenv('EXPORT_DIR', os.path.join(tempfile.gettempdir(), 'adveri-exports'))
+    EXPORT_RETENTION_HOURS = int(os.getenv('EXPORT_RETENTION_HOURS', 24))
+    CHART_DIR = os.getenv('CHART_DIR', os.path.join(tempfile.gettempdir(), 'adveri-charts'))
+    # Campaign listings report progress computed from the clock, so their ETags
+    # also roll over every this many seconds.
+    CAMPAIGN_ETAG_WINDOW = int(os.getenv('CAMPAIGN_ETAG_WINDOW', 60))
+    # Shared by every worker process: files under CACHE_DIR by default, or any
+    # Redis-protocol server when CACHE_REDIS_URL is set.
+    CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL')
+    CACHE_TYPE = os.getenv('CACHE_TYPE', 'RedisCache' if CACHE_REDIS_URL else 'FileSystemCache')
+    CACHE_DIR = os.getenv('CACHE_DIR', os.path.join(tempfile.gettempdir(), 'adveri-cache'))
+    CACHE_THRESHOLD = int(os.getenv('CACHE_THRESHOLD', 10000))
+    CACHE_DEFAULT_TIMEOUT = int(os.getenv('CACHE_DEFAULT_TIMEOUT', 300))
+    CACHE_KEY_PREFIX = 'adveri:'
+    MAIL_SERVER = os.getenv('MAIL_SERVER', 'smtp.example.com')
+    MAIL_PORT = int(os.getenv('MAIL_PORT', 587))
+    MAIL_USE_TLS = os.getenv('MAIL_USE_TLS', 'true').lower() == 'true'
     MAIL_USERNAME = os.getenv('MAIL_USERNAME')
     MAIL_PASSWORD = os.getenv('MAIL_PASSWORD')
+    # Messages sent over one SMTP connection before Flask-Mail reconnects, and
+    # idle connections each worker keeps open between batches.
+    MAIL_MAX_EMAILS = int(os.getenv('MAIL_MAX_EMAILS', 100))
+    MAIL_POOL_SIZE = int(os.getenv('MAIL_POOL_SIZE', 2))
@@ -0,0 +1,108 @@
+from datetime import datetime
+from sqlalchemy import event, func, inspect, literal, select, union_all
+from sqlalchemy.orm import Session
+from .extensions import db, cache
+from .models import Users, Sponsors, Influencers, Campaigns
+
+SNAPSHOT_KEY = 'admin:dashboard:snapshot'
+COUNTED_ROLES = ('sponsor', 'influencer')
+# Commits that change a counted row drop the snapshot; the TTL only bounds
+# staleness from writes made outside the ORM session.
+snapshot_ttl = 600
+
+def _key(kind, industry, flagged):
+    return f'{kind}|{industry or ""}|{int(bool(flagged))}'
+
+def compute_snapshot():
+    '''
+    One statement for every dashboard number: users grouped by role, industry
+    and flag, plus campaigns grouped by their sponsor's industry and flag.
+    '''
+    # Plain tables rather than the mapped subclasses, which would drag their
+    # own join to users into the outer joins.
+    users, sponsors, influencers = Users.__table__, Sponsors.__table__, Influencers.__table__
+    industry = func.coalesce(sponsors.c.industry, influencers.c.industry)
+    user_counts = (
+        select(users.c.role.label('kind'), industry.label('industry'), users.c.is_flagged.label('flagged'), func.count().label('total'))
+        .select_from(users)
+        .outerjoin(sponsors, sponsors.c.user_id == users.c.id)
+        .outerjoin(influencers, influencers.c.user_id == users.c.id)
+        .where(users.c.role.in_(COUNTED_ROLES))
+        .group_by(users.c.role, industry, users.c.is_flagged)
+    )
+    campaign_counts = (
+        select(literal('campaign').label('kind'), sponsors.c.industry.label('industry'), Campaigns.is_flagged.label('flagged'), func.count().label('total'))
+        .select_from(Campaigns)
+        .outerjoin(sponsors, sponsors.c.user_id == Campaigns.sponsor_id)
+        .group_by(sponsors.c.industry, Campaigns.is_flagged)
+    )
+    counts = {}
+    for kind, industry_name, flagged, total in db.session.execute(union_all(user_counts, campaign_counts)):
+        key = _key(kind, industry_name, flagged)
+        counts[key] = counts.get(key, 0) + total
+    return {'counts': counts, 'generated_at': datetime.now().isoformat()}
+
+def get_snapshot():
+    snapshot = cache.get(SNAPSHOT_KEY)
+    if snapshot is None:
+        snapshot = compute_snapshot()
+        cache.set(SNAPSHOT_KEY, snapshot, timeout = snapshot_ttl)
+    return snapshot
+
+def summarize(snapshot):
+    summary = {
+        'sponsors_count': 0, 'influencers_count': 0, 'campaigns_count': 0,
+        'flagged_sponsors_count': 0, 'flagged_influencers_count': 0, 'flagged_campaigns_count': 0,
+        'sponsors_by_industry': {}, 'influencers_by_industry': {}, 'campaigns_by_industry': {},
+        'generated_at': snapshot['generated_at'],
+    }
+    for key, total in snapshot['counts'].items():
+        kind, industry, flagged = key.split('|')
+        if total <= 0:
+            continue
+        if flagged == '1':
+            summary[f'flagged_{kind}s_count'] += total
+            continue
+        summary[f'{kind}s_count'] += total
+        by_industry = summary[f'{kind}s_by_industry']
+        by_industry[industry or 'unknown'] = by_industry.get(industry or 'unknown', 0) + total
+    return summary
+
+def _changes_counts(instance, state):
+    if isinstance(instance, Users):
+        return instance.role in COUNTED_ROLES and (
+            state != 'dirty' or any(inspect(instance).attrs[attribute].history.has_changes()
+                                    for attribute in ('industry', 'is_flagged') if hasattr(instance, attribute)))
+    if isinstance(instance, Campaigns):
+        return state != 'dirty' or any(inspect(instance).attrs[attribute].history.has_changes()
+                                       for attribute in ('is_flagged', 'sponsor_id'))
+    return False
+
+@event.listens_for(Session, 'after_flush')
+def _track_dashboard_changes(session, flush_context):
+    for state, instances in (('new', session.new), ('deleted', session.deleted), ('dirty', session.dirty)):
+        if any(_changes_counts(instance, state) for instance in instances):
+            session.info['dashboard_stale'] = True
+            return
+
+@event.listens_for(Session, 'do_orm_execute')
+def _track_bulk_dashboard_changes(orm_execute_state):
+    if orm_execute_state.is_select or orm_execute_state.bind_mapper is None:
+        return
+    if issubclass(orm_execute_state.bind_mapper.class_, (Users, Campaigns)):
+        orm_execute_state.session.info['dashboard_stale'] = True
+
+@event.listens_for(Session, 'after_commit')
+def _apply_dashboard_changes(session):
+    # Dropped rather than patched: patching is a read-modify-write on a cache
+    # shared by every process, so concurrent commits would lose updates.
+    if session.info.pop('dashboard_stale', False):
+        cache.delete(SNAPSHOT_KEY)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_dashboard_changes(session):
+    session.info.pop('dashboard_stale', None)
+
+def init_app(app):
+    global snapshot_ttl
+    snapshot_ttl = app.config.get('DASHBOARD_SNAPSHOT_TTL', 600)
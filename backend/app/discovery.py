@@ -0,0 +1,164 @@
+import time
+from bisect import bisect_left, insort
+from threading import RLock
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from .extensions import db
+from .models import Influencers, InfluencerPlatform
+
+class InfluencerIndex:
+    '''
+    In-memory inverted index for influencer discovery. Every niche, industry
+    and platform has a postings list of (-reach, user_id) kept sorted, so the
+    best-reach influencers for a facet are always at the front. niche/industry
+    postings rank by total reach across platforms, platform postings by the
+    reach on that platform.
+
+    The index loads lazily, is patched in place after commits that touch
+    Influencers/InfluencerPlatform rows, and is rebuilt from scratch every
+    DISCOVERY_INDEX_TTL seconds to pick up writes made by other processes.
+    '''
+    def __init__(self, ttl = 300):
+        self.ttl = ttl
+        self._lock = RLock()
+        self._profiles = {}
+        self._postings = {}
+        self._loaded_at = None
+
+    def init_app(self, app):
+        self.ttl = app.config.get('DISCOVERY_INDEX_TTL', 300)
+        app.extensions['influencer_index'] = self
+
+    def mark_stale(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def _fetch(self, user_ids = None):
+        influencers = select(Influencers.id, Influencers.first_name, Influencers.last_name,
+                             Influencers.niche, Influencers.industry)
+        platforms = select(InfluencerPlatform.user_id, InfluencerPlatform.platform, InfluencerPlatform.reach)
+        if user_ids is not None:
+            influencers = influencers.where(Influencers.id.in_(user_ids))
+            platforms = platforms.where(InfluencerPlatform.user_id.in_(user_ids))
+
+        profiles = {}
+        with db.engine.connect() as connection:
+            for user_id, first_name, last_name, niche, industry in connection.execute(influencers):
+                profiles[user_id] = {'id': user_id, 'name': f'{first_name} {last_name}', 'niche': niche,
+                                     'industry': industry, 'platforms': {}, 'reach': 0}
+            for user_id, platform, reach in connection.execute(platforms):
+                if user_id in profiles:
+                    profile = profiles[user_id]
+                    profile['platforms'][platform] = profile['platforms'].get(platform, 0) + (reach or 0)
+                    profile['reach'] += reach or 0
+        return profiles
+
+    @staticmethod
+    def _entries(profile):
+        yield ('niche', profile['niche']), profile['reach']
+        yield ('industry', profile['industry']), profile['reach']
+        yield ('all', None), profile['reach']
+        for platform, reach in profile['platforms'].items():
+            yield ('platform', platform), reach
+
+    def _add(self, profile):
+        self._profiles[profile['id']] = profile
+        for key, reach in self._entries(profile):
+            insort(self._postings.setdefault(key, []), (-reach, profile['id']))
+
+    def _remove(self, user_id):
+        profile = self._profiles.pop(user_id, None)
+        if profile is None:
+            return
+        for key, reach in self._entries(profile):
+            postings = self._postings[key]
+            position = bisect_left(postings, (-reach, user_id))
+            if position < len(postings) and postings[position] == (-reach, user_id):
+                del postings[position]
+            if not postings:
+                del self._postings[key]
+
+    def rebuild(self):
+        profiles = self._fetch()
+        with self._lock:
+            self._profiles, self._postings = {}, {}
+            for profile in profiles.values():
+                self._add(profile)
+            self._loaded_at = time.monotonic()
+
+    def refresh(self, user_ids):
+        if not user_ids or self._loaded_at is None:
+            return
+        profiles = self._fetch(user_ids)
+        with self._lock:
+            for user_id in user_ids:
+                self._remove(user_id)
+                if user_id in profiles:
+                    self._add(profiles[user_id])
+
+    def _ensure_loaded(self):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl:
+            self.rebuild()
+
+    def search(self, niche = None, industry = None, platform = None, min_reach = 0, k = 20):
+        '''
+        Top-k influencers matching every given facet, best reach first. The
+        scan walks the postings list that defines the ranking (the platform
+        if one is given, otherwise the shorter of niche/industry) and checks
+        the remaining facets against the profile, stopping after k hits or
+        once reach drops below min_reach.
+        '''
+        self._ensure_loaded()
+        with self._lock:
+            if platform:
+                driver = self._postings.get(('platform', platform), [])
+            else:
+                candidates = [self._postings.get(key, []) for key in (('niche', niche), ('industry', industry))
+                              if key[1]]
+                driver = min(candidates, key = len) if candidates else self._postings.get(('all', None), [])
+
+            results = []
+            for negative_reach, user_id in driver:
+                if -negative_reach < min_reach or len(results) >= k:
+                    break
+                profile = self._profiles[user_id]
+                if niche and profile['niche'] != niche:
+                    continue
+                if industry and profile['industry'] != industry:
+                    continue
+                results.append({**profile, 'platforms': dict(profile['platforms']), 'rank_reach': -negative_reach})
+            return results
+
+influencer_index = InfluencerIndex()
+
+@event.listens_for(Session, 'after_flush')
+def _track_influencer_changes(session, flush_context):
+    touched = session.info.setdefault('discovery_touched', set())
+    for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(instance, Influencers):
+            touched.add(instance.id)
+        elif isinstance(instance, InfluencerPlatform):
+            touched.add(instance.user_id)
+
+@event.listens_for(Session, 'do_orm_execute')
+def _track_bulk_influencer_changes(orm_execute_state):
+    if orm_execute_state.is_select or orm_execute_state.bind_mapper is None:
+        return
+    if orm_execute_state.bind_mapper.class_ in (Influencers, InfluencerPlatform):
+        orm_execute_state.session.info['discovery_stale'] = True
+
+@event.listens_for(Session, 'after_commit')
+def _apply_influencer_changes(session):
+    touched = session.info.pop('discovery_touched', None)
+    if session.info.pop('discovery_stale', False):
+        influencer_index.mark_stale()
+    elif touched:
+        influencer_index.refresh(touched)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_influencer_changes(session):
+    session.info.pop('discovery_touched', None)
+    session.info.pop('discovery_stale', None)
+
+def init_app(app):
+    influencer_index.init_app(app)
@@ -0,0 +1,59 @@
+from datetime import datetime, timedelta
+from sqlalchemy import delete, func, insert, literal, select, update
+from .extensions import db
+from .models import Influencers, EarningsLedger
+from .cache_tags import touch
+
+def payout_for(ad_request):
+    influencer_id = ad_request.receiver_id if ad_request.sent_by == 'sponsor' else ad_request.sender_id
+    amount = ad_request.negotiated_amount if ad_request.negotiated_amount else ad_request.payment_amount
+    return influencer_id, amount
+
+def credit_request(influencer_id, request_id, amount):
+    '''
+    Appends the ledger entry for an accepted request and bumps the running
+    total with `earnings = earnings + :amount`, so concurrent accepts never
+    overwrite each other. Runs in the caller's transaction; the unique
+    request_id on the ledger stops a request from being credited twice.
+    '''
+    db.session.execute(
+        insert(EarningsLedger).values(influencer_id = influencer_id, request_id = request_id, amount = amount)
+        .execution_options(cache_tags = [f'earnings:influencer:{influencer_id}', f'users:{influencer_id}'])
+    )
+    influencers = Influencers.__table__
+    db.session.execute(
+        update(influencers)
+        .where(influencers.c.user_id == influencer_id)
+        .values(earnings = influencers.c.earnings + amount)
+    )
+
+def get_earnings(influencer_id):
+    return db.session.scalar(select(Influencers.earnings).where(Influencers.user_id == influencer_id))
+
+def rollup_ledger(older_than_days = 30):
+    '''
+    Compacts ledger entries older than the cutoff into one rollup entry per
+    influencer. Running totals already include these amounts and are left
+    untouched; only the ledger shrinks.
+    '''
+    cutoff = datetime.now() - timedelta(days = older_than_days)
+    ledger = EarningsLedger.__table__
+    last_id = db.session.scalar(select(func.max(ledger.c.id)).where(ledger.c.created_at < cutoff))
+    if last_id is None:
+        return 0
+
+    old_entries = (ledger.c.id <= last_id) & (ledger.c.created_at < cutoff)
+    try:
+        db.session.execute(insert(ledger).from_select(
+            ['influencer_id', 'amount', 'created_at', 'is_rollup'],
+            select(ledger.c.influencer_id, func.sum(ledger.c.amount), literal(cutoff), literal(True))
+            .where(old_entries)
+            .group_by(ledger.c.influencer_id)
+        ))
+        compacted = db.session.execute(delete(ledger).where(old_entries)).rowcount
+        touch(db.session, 'earnings:*')
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return compacted
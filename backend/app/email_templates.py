@@ -0,0 +1,114 @@
+import os
+import re
+import threading
+from flask import render_template
+from markupsafe import escape
+
+_FIELD = re.compile('\x00([A-Za-z_]\\w*)\\.(\\w+)\x00')
+
+class Placeholder:
+    '''Stands in for a per-recipient object: every attribute renders as a sentinel.'''
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, attribute):
+        if attribute.startswith('__'):
+            raise AttributeError(attribute)
+        return f'\x00{self._name}.{attribute}\x00'
+
+def _lookup(value, attribute):
+    try:
+        return getattr(value, attribute)
+    except AttributeError:
+        return value[attribute]
+
+class PrecompiledTemplate:
+    '''
+    Template output split into static segments and the per-recipient fields
+    between them. Rendering escapes the fields and joins the segments, so
+    the hot loop never goes through Jinja.
+    '''
+    def __init__(self, source, names):
+        parts = _FIELD.split(source)
+        self.source = source
+        self.static = parts[0::3]
+        self.fields = list(zip(parts[1::3], parts[2::3]))
+        unknown = {name for name, _ in self.fields} - set(names)
+        if unknown or '\x00' in ''.join(self.static):
+            # A filter or expression mangled a sentinel, e.g. {{ user.name|upper }}.
+            raise ValueError(f'Template fields cannot be precompiled: {sorted(unknown) or "mangled placeholder"}')
+
+    def render(self, **context):
+        out = [self.static[0]]
+        for (name, attribute), static in zip(self.fields, self.static[1:]):
+            out.append(escape(_lookup(context[name], attribute)))
+            out.append(static)
+        return ''.join(out)
+
+class PrecompiledReport:
+    '''
+    A page with one repeated section (a {% for %} over an included partial).
+    The page is rendered with two placeholder items and split around them
+    into head, separator and tail; the partial is precompiled on its own and
+    the page without items is kept separately.
+    '''
+    def __init__(self, page, empty_page, item, names, item_name):
+        head, found, rest = page.partition(item.source)
+        separator, found_again, tail = rest.partition(item.source)
+        if not (found and found_again) or item.source in tail:
+            raise ValueError('The repeated section could not be located in the page.')
+        self.head = PrecompiledTemplate(head, names)
+        self.separator = separator
+        self.tail = PrecompiledTemplate(tail, names)
+        self.empty = PrecompiledTemplate(empty_page, names)
+        self.item = item
+        self.item_name = item_name
+
+    def render(self, items, **context):
+        body = self.separator.join(self.item.render(**{self.item_name: item}) for item in items)
+        if not body:
+            return self.empty.render(**context)
+        return ''.join([self.head.render(**context), body, self.tail.render(**context)])
+
+_compiled = {}
+_compiled_pid = os.getpid()
+_lock = threading.RLock()
+
+def _cached(key, build):
+    global _compiled, _compiled_pid
+    with _lock:
+        if _compiled_pid != os.getpid():
+            _compiled, _compiled_pid = {}, os.getpid()
+        if key not in _compiled:
+            _compiled[key] = build()
+        return _compiled[key]
+
+def precompiled(name, fields, **constants):
+    '''
+    Compiled once per worker process: renders name with a Placeholder for
+    every per-recipient context name in fields and the constants as given.
+    '''
+    def build():
+        placeholders = {field: Placeholder(field) for field in fields}
+        return PrecompiledTemplate(render_template(name, **placeholders, **constants), fields)
+    return _cached((name, tuple(fields), tuple(sorted(constants.items()))), build)
+
+def precompiled_report(name, item_template, fields, loop, item_name, **constants):
+    '''
+    Like precompiled, for a page that loops over `loop` and renders
+    item_template for each entry as `item_name`.
+    '''
+    def build():
+        item = precompiled(item_template, (item_name,))
+        placeholders = {field: Placeholder(field) for field in fields}
+        page = render_template(name, **placeholders, **{loop: [Placeholder(item_name)] * 2}, **constants)
+        empty_page = render_template(name, **placeholders, **{loop: []}, **constants)
+        return PrecompiledReport(page, empty_page, item, fields, item_name)
+    return _cached((name, item_template, tuple(fields), loop, tuple(sorted(constants.items()))), build)
+
+def daily_reminder(message):
+    return precompiled('daily_reminder.html', ('user',), message = message)
+
+def monthly_report():
+    return precompiled_report('monthly_report.html', 'monthly_report_campaign.html', ('user',),
+                              loop = 'campaign_details', item_name = 'campaign')
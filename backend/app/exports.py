@@ -0,0 +1,128 @@
+import csv
+import gzip
+import io
+import os
+from datetime import datetime, timedelta
+from sqlalchemy import select, update
+from .extensions import db
+from .models import Users, Campaigns, AdRequests, JoinedInfluencers, ExportJob
+from .serializers import FIELDS, dumps
+
+EXPORT_FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+class ExportError(Exception):
+    def __init__(self, message, status = 400):
+        super().__init__(message)
+        self.status = status
+
+def export_columns():
+    '''Campaign, ad request and joined influencer columns, prefixed by source.'''
+    return [
+        *(getattr(Campaigns, field).label(f'campaign_{field}') for field in FIELDS[Campaigns]),
+        *(getattr(AdRequests, field).label(f'request_{field}') for field in FIELDS[AdRequests]),
+        *(getattr(JoinedInfluencers, field).label(f'joined_{field}') for field in FIELDS[JoinedInfluencers]),
+    ]
+
+def export_statement(role, user_id):
+    '''
+    One row per ad request (or per campaign without any), with the joined
+    influencer record if the request was accepted. Sponsors export their own
+    campaigns, admins everything.
+    '''
+    statement = (
+        select(*export_columns())
+        .select_from(Campaigns)
+        .outerjoin(AdRequests, AdRequests.campaign_id == Campaigns.id)
+        .outerjoin(JoinedInfluencers, JoinedInfluencers.request_id == AdRequests.id)
+        .order_by(Campaigns.id, AdRequests.id)
+    )
+    if role == 'sponsor':
+        statement = statement.where(Campaigns.sponsor_id == user_id)
+    return statement
+
+def start_export(user_id, format = 'csv', compressed = False):
+    if format not in EXPORT_FORMATS:
+        raise ExportError(f'Unsupported format \'{format}\', use one of: {", ".join(EXPORT_FORMATS)}.')
+    job = ExportJob(user_id = user_id, format = format, compressed = bool(compressed))
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+def get_export(job_id, user_id, role):
+    job = db.session.get(ExportJob, job_id)
+    if job is None or (role != 'admin' and job.user_id != user_id):
+        raise ExportError('Export not found.', 404)
+    return job
+
+def filename(job):
+    return f'adveri-export-{job.id}.{job.format}' + ('.gz' if job.compressed else '')
+
+def _write_rows(out, rows, format):
+    count = 0
+    if format == 'csv':
+        text = io.TextIOWrapper(out, encoding = 'utf-8', newline = '')
+        writer = csv.writer(text)
+        writer.writerow(rows.keys())
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+        text.flush()
+        text.detach()
+    else:
+        keys = list(rows.keys())
+        for row in rows:
+            out.write(dumps(dict(zip(keys, row))) + b'\n')
+            count += 1
+    return count
+
+def mark_failed(job_id, error):
+    jobs = ExportJob.__table__
+    db.session.execute(update(jobs).where(jobs.c.id == job_id).values(
+        status = 'failed', error = error, finished_at = datetime.now()))
+    db.session.commit()
+
+def run_export(job_id, export_dir, batch_size = 1000):
+    '''
+    Streams the export rows with yield_per into a file under export_dir,
+    written to a temporary name and renamed once complete, so memory stays
+    flat however many rows there are and a half-written file is never served.
+    '''
+    job = db.session.get(ExportJob, job_id)
+    role = db.session.scalar(select(Users.role).where(Users.id == job.user_id))
+    jobs = ExportJob.__table__
+    db.session.execute(update(jobs).where(jobs.c.id == job_id).values(status = 'running'))
+    db.session.commit()
+
+    os.makedirs(export_dir, exist_ok = True)
+    path = os.path.join(export_dir, filename(job))
+    partial = path + '.part'
+    try:
+        rows = db.session.execute(export_statement(role, job.user_id), execution_options = {'yield_per': batch_size})
+        with open(partial, 'wb') as raw:
+            out = gzip.GzipFile(fileobj = raw, mode = 'wb') if job.compressed else raw
+            count = _write_rows(out, rows, job.format)
+            if job.compressed:
+                out.close()
+        os.replace(partial, path)
+    except Exception as e:
+        db.session.rollback()
+        if os.path.exists(partial):
+            os.remove(partial)
+        mark_failed(job_id, str(e))
+        raise
+
+    db.session.execute(update(jobs).where(jobs.c.id == job_id).values(
+        status = 'done', rows = count, path = path, finished_at = datetime.now()))
+    db.session.commit()
+    return count
+
+def purge_exports(older_than_hours):
+    '''Deletes export files and jobs older than the cutoff.'''
+    cutoff = datetime.now() - timedelta(hours = older_than_hours)
+    jobs = db.session.scalars(select(ExportJob).where(ExportJob.created_at < cutoff)).all()
+    for job in jobs:
+        if job.path and os.path.exists(job.path):
+            os.remove(job.path)
+        db.session.delete(job)
+    db.session.commit()
+    return len(jobs)
@@ -0,0 +1,90 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from threading import BoundedSemaphore
+from .extensions import bcrypt
+
+class HashingBusy(Exception):
+    pass
+
+class HashingPool:
+    '''
+    Runs bcrypt on a small dedicated thread pool so that login spikes queue up
+    here instead of holding every request worker for the full bcrypt cost.
+    At most `workers + queue_depth` jobs are admitted; anything beyond that
+    fails fast with HashingBusy.
+    '''
+    def __init__(self, app = None):
+        self._executor = None
+        self._slots = None
+        self.workers = 4
+        self.queue_depth = 32
+        self.timeout = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.configure(
+            workers = app.config.get('HASHING_WORKERS', 4),
+            queue_depth = app.config.get('HASHING_QUEUE_DEPTH', 32),
+            timeout = app.config.get('HASHING_TIMEOUT', 10)
+        )
+        app.extensions['hashing'] = self
+
+    def configure(self, workers = 4, queue_depth = 32, timeout = 10):
+        if self._executor is not None:
+            self._executor.shutdown(wait = False)
+        self._executor = ThreadPoolExecutor(max_workers = workers, thread_name_prefix = 'bcrypt')
+        self._slots = BoundedSemaphore(workers + queue_depth)
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self.timeout = timeout
+
+    def after_fork(self):
+        # The executor's threads only exist in the parent; build a fresh pool
+        # instead of shutting down one the child never owned.
+        if self._executor is not None:
+            self._executor = None
+            self.configure(self.workers, self.queue_depth, self.timeout)
+
+    def submit(self, fn, *args, block = False):
+        if self._executor is None:
+            self.configure()
+        if not self._slots.acquire(blocking = block, timeout = self.timeout if block else None):
+            raise HashingBusy('Password hashing queue is full.')
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def _result(self, future):
+        try:
+            return future.result(timeout = self.timeout)
+        except TimeoutError:
+            raise HashingBusy('Password hashing timed out.')
+
+    def generate_password_hash(self, password):
+        return self._result(self.submit(bcrypt.generate_password_hash, password)).decode('utf-8')
+
+    def generate_password_hashes(self, passwords):
+        # Bulk callers wait for a free slot instead of failing fast, and keep at
+        # most one job per worker in flight so interactive logins can still queue.
+        window = self.workers
+        futures, hashes = [], []
+        for password in passwords:
+            if len(futures) >= window:
+                hashes.append(self._result(futures.pop(0)).decode('utf-8'))
+            futures.append(self.submit(bcrypt.generate_password_hash, password, block = True))
+        hashes.extend(self._result(future).decode('utf-8') for future in futures)
+        return hashes
+
+    def check_password_hash(self, pw_hash, password):
+        return self._result(self.submit(bcrypt.check_password_hash, pw_hash, password))
+
+hasher = HashingPool()
+os.register_at_fork(after_in_child = hasher.after_fork)
+
+def init_app(app):
+    hasher.init_app(app)
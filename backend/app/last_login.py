@@ -0,0 +1,93 @@
+import atexit
+import os
+from datetime import datetime
+from threading import Event, Lock, Thread
+from sqlalchemy import bindparam
+from .extensions import db
+from .models import Users
+
+class LastLoginBuffer:
+    '''
+    Write-behind buffer for Users.last_login_at. Logins only record the
+    timestamp in memory (latest one wins per user); a background thread
+    writes everything out as one bulk UPDATE every LAST_LOGIN_FLUSH_INTERVAL
+    seconds, or sooner once LAST_LOGIN_FLUSH_SIZE users are pending.
+    '''
+    def __init__(self, app = None):
+        self.app = None
+        self.interval = 30
+        self.max_size = 500
+        self._pending = {}
+        self._lock = Lock()
+        self._wakeup = Event()
+        self._thread = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.interval = app.config.get('LAST_LOGIN_FLUSH_INTERVAL', 30)
+        self.max_size = app.config.get('LAST_LOGIN_FLUSH_SIZE', 500)
+        app.extensions['last_login_buffer'] = self
+        atexit.register(self.flush)
+
+    def record(self, user_id, login_at = None):
+        with self._lock:
+            self._pending[user_id] = login_at or datetime.now()
+            full = len(self._pending) >= self.max_size
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = Thread(target = self._run, name = 'last-login-flush', daemon = True)
+                self._thread.start()
+        if full:
+            self._wakeup.set()
+
+    def after_fork(self):
+        # Timestamps recorded before the fork stay with the parent to flush,
+        # and the flush thread and its lock did not survive the fork.
+        self._pending = {}
+        self._lock = Lock()
+        self._wakeup = Event()
+        self._thread = None
+
+    def pending(self, user_id):
+        with self._lock:
+            return self._pending.get(user_id)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                self.app.logger.exception('Flushing last login timestamps failed, will retry.')
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending or self.app is None:
+            return 0
+
+        users = Users.__table__
+        statement = (
+            users.update()
+            .where(users.c.id == bindparam('user_id'))
+            .values(last_login_at = bindparam('login_at'))
+        )
+        rows = [{'user_id': user_id, 'login_at': login_at} for user_id, login_at in pending.items()]
+        try:
+            with self.app.app_context(), db.engine.begin() as connection:
+                connection.execute(statement, rows)
+        except Exception:
+            # Put the batch back unless a newer login has been recorded meanwhile.
+            with self._lock:
+                for user_id, login_at in pending.items():
+                    self._pending.setdefault(user_id, login_at)
+            raise
+        return len(rows)
+
+last_login_buffer = LastLoginBuffer()
+os.register_at_fork(after_in_child = last_login_buffer.after_fork)
+
+def init_app(app):
+    last_login_buffer.init_app(app)
@@ -1,12 +1,104 @@
-from flask_mail import Message, Mail
+import os
+import smtplib
+import threading
+from flask_mail import Message
 from flask import current_app as app
+from .extensions import mail
 
-mail = Mail()
+SENDER = 'noreply@adveri.com'
+
+class SMTPPool:
+    '''
+    SMTP connections kept open per worker process, so a batch pays the
+    connect/STARTTLS/login handshake once instead of once per email.
+    Flask-Mail reconnects a connection by itself after MAIL_MAX_EMAILS
+    messages; a connection that errors is dropped and replaced.
+    '''
+    def __init__(self, size = 2):
+        self.size = size
+        self._idle = []
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def init_app(self, app):
+        self.size = app.config.get('MAIL_POOL_SIZE', self.size)
+        app.extensions['smtp_pool'] = self
+
+    def acquire(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                # Sockets inherited across fork() belong to the parent.
+                self._idle, self._pid = [], os.getpid()
+            if self._idle:
+                return self._idle.pop()
+        return mail.connect().__enter__()
+
+    def release(self, connection, broken = False):
+        with self._lock:
+            if not broken and self._pid == os.getpid() and len(self._idle) < self.size:
+                self._idle.append(connection)
+                return
+        self.close(connection)
+
+    @staticmethod
+    def close(connection):
+        try:
+            connection.__exit__(None, None, None)
+        except (smtplib.SMTPException, OSError):
+            pass
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            self.close(connection)
+
+smtp_pool = SMTPPool()
 
 def init_app(app):
-    mail.init_app(app)
+    smtp_pool.init_app(app)
 
 def send_email(to, subject, body):
-    sender = 'noreply@adveri.com'
-    message = Message(subject, sender = sender, recipients = [to], html = body)
-    mail.send(message)
\ No newline at end of file
+    message = Message(subject, sender = SENDER, recipients = [to], html = body)
+    mail.send(message)
+
+def send_batch(messages):
+    '''
+    Sends (to, subject, html) messages over one pooled connection. A message
+    that fails is retried once on a fresh connection; if that fails too it is
+    reported back instead of raised. Returns (sent, failed recipients).
+    '''
+    sent, failed = 0, []
+    messages = iter(messages)
+    try:
+        connection = smtp_pool.acquire()
+    except (smtplib.SMTPException, OSError):
+        return 0, [to for to, _, _ in messages]
+    try:
+        for to, subject, body in messages:
+            message = Message(subject, sender = SENDER, recipients = [to], html = body)
+            try:
+                connection.send(message)
+            except (smtplib.SMTPException, OSError):
+                smtp_pool.close(connection)
+                try:
+                    connection = mail.connect().__enter__()
+                except (smtplib.SMTPException, OSError):
+                    # Server unreachable: report the rest as failed rather than reconnecting per message.
+                    connection = None
+                    failed.append(to)
+                    failed.extend(rest for rest, _, _ in messages)
+                    break
+                try:
+                    connection.send(message)
+                except (smtplib.SMTPException, OSError):
+                    failed.append(to)
+                    continue
+            sent += 1
+    except BaseException:
+        if connection is not None:
+            smtp_pool.release(connection, broken = True)
+        raise
+    if connection is not None:
+        smtp_pool.release(connection)
+    return sent, failed
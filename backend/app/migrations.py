@@ -0,0 +1,95 @@
+import sys
+from datetime import datetime, timedelta
+from sqlalchemy import func, inspect, select, text
+from sqlalchemy.schema import CreateColumn
+from .extensions import db
+from .models import Users, Campaigns, AdRequests
+
+def upgrade_columns():
+    '''
+    Adds columns declared on the models but missing from existing tables.
+    SQLite can only add a NOT NULL column together with a DEFAULT, so new
+    non-nullable columns need a server_default.
+    '''
+    inspector = inspect(db.engine)
+    tables = set(inspector.get_table_names())
+    added = []
+    with db.engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            if table.name not in tables:
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    ddl = CreateColumn(column).compile(dialect = connection.dialect)
+                    connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {ddl}'))
+                    added.append(f'{table.name}.{column.name}')
+    return added
+
+def upgrade_indexes():
+    '''
+    create_all() only creates indexes together with brand new tables, so
+    databases created before an index was declared never get it. This
+    creates every declared index that is still missing and is safe to rerun.
+    '''
+    inspector = inspect(db.engine)
+    tables = set(inspector.get_table_names())
+    created = []
+    for table in db.metadata.sorted_tables:
+        if table.name not in tables:
+            continue
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind = db.engine)
+                created.append(index.name)
+    return created
+
+def _plan_checks():
+    cutoff = datetime.now() - timedelta(days = 1)
+    return {
+        'spn_send_request duplicate check': select(AdRequests.id).where(AdRequests.campaign_id == 1, AdRequests.receiver_id == 1),
+        'spn_edit_request sent requests': select(AdRequests).where(AdRequests.sender_id == 1),
+        'spn_edit_request received requests': select(AdRequests).where(AdRequests.receiver_id == 1),
+        'send_monthly_email expenditure': select(func.sum(AdRequests.payment_amount)).where(AdRequests.campaign_id == 1),
+        'view_sponsor_applications': select(Users.id).where(Users.role == 'sponsor', Users.approved == False),
+        'send_daily_email inactive users': select(Users.id).where(Users.last_login_at < cutoff, Users.role != 'admin'),
+        'sponsor campaigns by start date': select(Campaigns.id).where(Campaigns.sponsor_id == 1, Campaigns.start_date < cutoff),
+    }
+
+def _is_full_scan(detail):
+    return detail.startswith('SCAN ') and ' USING ' not in detail
+
+def check_query_plans():
+    '''
+    Runs EXPLAIN QUERY PLAN for the hot access paths and returns
+    {query name: [plan lines]} for every query that scans a whole table.
+    '''
+    failures = {}
+    with db.engine.connect() as connection:
+        for name, statement in _plan_checks().items():
+            sql = str(statement.compile(dialect = connection.dialect, compile_kwargs = {'literal_binds': True}))
+            plan = [row[-1] for row in connection.execute(text(f'EXPLAIN QUERY PLAN {sql}'))]
+            if any(_is_full_scan(detail) for detail in plan):
+                failures[name] = plan
+    return failures
+
+def init_app(app):
+    @app.cli.command('upgrade-indexes')
+    def upgrade_indexes_command():
+        created = upgrade_indexes()
+        print(f'Created {len(created)} missing indexes.' if created else 'All indexes are up to date.')
+
+    @app.cli.command('upgrade-columns')
+    def upgrade_columns_command():
+        added = upgrade_columns()
+        print(f'Added columns: {", ".join(added)}.' if added else 'All columns are up to date.')
+
+    @app.cli.command('check-query-plans')
+    def check_query_plans_command():
+        failures = check_query_plans()
+        for name, plan in failures.items():
+            print(f'FULL SCAN in {name}: {"; ".join(plan)}')
+        if failures:
+            sys.exit(1)
+        print('All checked queries use an index.')
@@ -1,4 +1,6 @@
-from .extensions import db, bcrypt
+from .extensions import db
+from .hashing import hasher
+from .config import Config
 from datetime import datetime, timedelta
 
 class Users(db.Model):
@@ -11,6 +13,10 @@ class Users(db.Model):
     approved = db.Column(db.Boolean, default = False, nullable = False)
     is_flagged = db.Column(db.Boolean, default = False, nullable = False)
     last_login_at = db.Column(db.DateTime, default = datetime.now)
+    __table_args__ = (
+        db.Index('ix_users_role_approved', 'role', 'approved'),
+        db.Index('ix_users_last_login_at', 'last_login_at'),
+    )
     __mapper_args__ = {
         'polymorphic_on': role,
         'polymorphic_identity': 'user'
@@ -19,12 +25,24 @@ class Users(db.Model):
     sent_requests = db.relationship('AdRequests', foreign_keys='AdRequests.sender_id', backref='sender')
     received_requests = db.relationship('AdRequests', foreign_keys='AdRequests.receiver_id', backref='receiver')
     
-    def __init__(self, username, email, password, role):
+    def __init__(self, username, email, password, role, **kwargs):
+        super().__init__(**kwargs)
         self.username = username
-        self.password = bcrypt.generate_password_hash(password).decode('utf-8')
+        self.password = hasher.generate_password_hash(password)
         self.email = email
         self.role = role
 
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'username': self.username,
+            'email': self.email,
+            'role': self.role,
+            'approved': self.approved,
+            'is_flagged': self.is_flagged,
+            'last_login_at': self.last_login_at.isoformat() if self.last_login_at else None
+        }
+
 class Admin(Users):
     __tablename__ = 'admin'
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key = True)
@@ -39,9 +57,18 @@ class Sponsors(Users):
     industry = db.Column(db.String, nullable = False)
     budget = db.Column(db.Float, nullable = False)
     __mapper_args__ = {
-        'polymorphic_identity': 'sponsor'
+        'polymorphic_identity': 'sponsor',
+        'polymorphic_load': Config.POLYMORPHIC_LOADING
     }
 
+    def to_dict(self):
+        return {
+            **super().to_dict(),
+            'entity_name': self.entity_name,
+            'industry': self.industry,
+            'budget': self.budget
+        }
+
 class Influencers(Users):
     __tablename__ = 'influencers'
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key = True)
@@ -51,11 +78,25 @@ class Influencers(Users):
     gender = db.Column(db.String(1), nullable = False)
     niche = db.Column(db.String, nullable = False)
     industry = db.Column(db.String, nullable = False)
+    earnings = db.Column(db.Float, nullable = False, default = 0, server_default = '0')
 
     __mapper_args__ = {
-        'polymorphic_identity': 'influencer'
+        'polymorphic_identity': 'influencer',
+        'polymorphic_load': Config.POLYMORPHIC_LOADING
     }
 
+    def to_dict(self):
+        return {
+            **super().to_dict(),
+            'first_name': self.first_name,
+            'last_name': self.last_name,
+            'dob': self.dob.date().isoformat() if self.dob else None,
+            'gender': self.gender,
+            'niche': self.niche,
+            'industry': self.industry,
+            'earnings': self.earnings
+        }
+
     # platforms = db.relationship('InfluencerPlatform', back_populates = 'influencer', cascade = 'all, delete-orphan')
     # ad_requests = db.relationship('AdRequests', back_populates = 'influencer', cascade = 'all, delete-orphan')
 
@@ -81,13 +122,14 @@ class Campaigns(db.Model):
     visibility = db.Column(db.String, nullable=False, default='public')
     campaign_reach = db.Column(db.Integer, nullable=False, default=0)
     goals_met = db.Column(db.Boolean, default=False)
+    is_flagged = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
+    __table_args__ = (
+        db.Index('ix_campaigns_sponsor_id_start_date', 'sponsor_id', 'start_date'),
+    )
 
     ad_requests = db.relationship('AdRequests', back_populates='campaign', cascade='all, delete-orphan')
     joined_influencers = db.relationship('JoinedInfluencers', back_populates='campaign', cascade='all, delete-orphan')
 
-    def __init__(self):
-        self.goals_met = self.goals == self.campaign_reach
-
 class AdRequests(db.Model):
     __tablename__ = 'ad_requests'
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
@@ -99,7 +141,15 @@ class AdRequests(db.Model):
     requirements = db.Column(db.String, nullable=False)
     payment_amount = db.Column(db.Float, nullable=False)
     negotiated_amount = db.Column(db.Float, nullable=False, default=0)
-    status = db.Column(db.String, nullable=False)
+    status = db.Column(db.String, nullable=False, default='pending')
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    # Who made the current offer; NULL means the sender (the original offer).
+    last_actor_id = db.Column(db.Integer, db.ForeignKey('users.id'))
+    __table_args__ = (
+        db.Index('ix_ad_requests_campaign_id_receiver_id', 'campaign_id', 'receiver_id'),
+        db.Index('ix_ad_requests_sender_id', 'sender_id'),
+        db.Index('ix_ad_requests_receiver_id', 'receiver_id'),
+    )
 
     campaign = db.relationship('Campaigns', back_populates='ad_requests')
     joined_influencers = db.relationship('JoinedInfluencers', back_populates='ad_request', cascade='all, delete-orphan')
@@ -111,6 +161,61 @@ class JoinedInfluencers(db.Model):
     request_id = db.Column(db.Integer, db.ForeignKey('ad_requests.id'), nullable=False)
     campaign_id = db.Column(db.Integer, db.ForeignKey('campaigns.id'), nullable=False)
     payment_amount = db.Column(db.Float, nullable=False)
+    __table_args__ = (
+        db.Index('ix_joined_influencers_campaign_id', 'campaign_id'),
+    )
 
     campaign = db.relationship('Campaigns', back_populates='joined_influencers')
     ad_request = db.relationship('AdRequests', back_populates='joined_influencers')
+
+class EarningsLedger(db.Model):
+    __tablename__ = 'earnings_ledger'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    influencer_id = db.Column(db.Integer, db.ForeignKey('influencers.user_id'), nullable=False)
+    request_id = db.Column(db.Integer, db.ForeignKey('ad_requests.id', ondelete='SET NULL'), unique=True)
+    amount = db.Column(db.Float, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    is_rollup = db.Column(db.Boolean, nullable=False, default=False)
+    __table_args__ = (
+        db.Index('ix_earnings_ledger_influencer_id_created_at', 'influencer_id', 'created_at'),
+    )
+
+class ReportCheckpoint(db.Model):
+    __tablename__ = 'report_checkpoints'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    sponsor_id = db.Column(db.Integer, db.ForeignKey('sponsors.user_id', ondelete='CASCADE'), nullable=False)
+    period = db.Column(db.String(7), nullable=False)  # 'YYYY-MM'
+    status = db.Column(db.String(10), nullable=False, default='claimed')  # claimed, sent
+    claimed_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    sent_at = db.Column(db.DateTime)
+    __table_args__ = (
+        db.UniqueConstraint('sponsor_id', 'period', name='uq_report_checkpoints_sponsor_id_period'),
+    )
+
+class ExportJob(db.Model):
+    __tablename__ = 'export_jobs'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    format = db.Column(db.String(10), nullable=False, default='csv')  # csv, ndjson
+    compressed = db.Column(db.Boolean, nullable=False, default=False)
+    status = db.Column(db.String(10), nullable=False, default='pending')  # pending, running, done, failed
+    rows = db.Column(db.Integer, nullable=False, default=0)
+    path = db.Column(db.String(255))
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    finished_at = db.Column(db.DateTime)
+    __table_args__ = (
+        db.Index('ix_export_jobs_user_id', 'user_id'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'format': self.format,
+            'compressed': self.compressed,
+            'status': self.status,
+            'rows': self.rows,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
@@ -0,0 +1,100 @@
+from sqlalchemy import func, insert, or_, select, update
+from .extensions import db
+from .models import AdRequests, JoinedInfluencers
+from .earnings import credit_request, payout_for
+from .cache_tags import touch
+
+# Allowed status changes for an ad request. Accepted and rejected requests are final.
+TRANSITIONS = {
+    'pending': ('negotiation', 'accept', 'reject'),
+    'negotiation': ('negotiation', 'accept', 'reject'),
+    'accept': (),
+    'reject': (),
+}
+# Statuses that answer the current offer, so only the party who did not make it may set them.
+RESPONSES = ('accept', 'reject')
+EDITABLE_FIELDS = ('message', 'requirements', 'payment_amount', 'negotiated_amount')
+
+class TransitionError(Exception):
+    def __init__(self, message, status = 409, current = None):
+        super().__init__(message)
+        self.status = status
+        self.current = current
+
+class VersionConflict(TransitionError):
+    pass
+
+def expected_version(request, data):
+    '''The client's version comes from the body or an If-Match header.'''
+    version = data.get('version')
+    if version is None and request.headers.get('If-Match'):
+        version = request.headers['If-Match'].removeprefix('W/').strip('"')
+    try:
+        return int(version)
+    except (TypeError, ValueError):
+        raise TransitionError('The current request version is required (send "version" or If-Match).', 428)
+
+def apply_change(request_id, user_id, version, status = None, **values):
+    '''
+    Applies an edit and/or status change as a single compare-and-swap:
+    UPDATE ... WHERE id = :id AND version = :version AND status IN (...)
+    bumps the version only if nobody else changed the request since the
+    client read it. No row lock is taken; a lost race surfaces as
+    VersionConflict (409) carrying the current status and version.
+    Every change records user_id as the last actor, and accept/reject
+    only match when the last offer came from the other party (403).
+    Accepting credits the influencer and records them as joined in the
+    same transaction.
+    '''
+    values = {field: value for field, value in values.items() if field in EDITABLE_FIELDS and value is not None}
+    if status is None:
+        allowed_from = [state for state, targets in TRANSITIONS.items() if targets]
+    else:
+        allowed_from = [state for state, targets in TRANSITIONS.items() if status in targets]
+        if not allowed_from:
+            raise TransitionError(f'Unknown status \'{status}\'.', 400)
+        values['status'] = status
+
+    table = AdRequests.__table__
+    last_actor = func.coalesce(table.c.last_actor_id, table.c.sender_id)
+    criteria = [table.c.id == request_id, table.c.version == version, table.c.status.in_(allowed_from),
+                or_(table.c.sender_id == user_id, table.c.receiver_id == user_id)]
+    if status in RESPONSES:
+        criteria.append(last_actor != user_id)
+    updated = db.session.execute(
+        update(table)
+        .where(*criteria)
+        .values(version = table.c.version + 1, last_actor_id = user_id, **values)
+        .returning(table.c.id, table.c.sent_by, table.c.sender_id, table.c.receiver_id, table.c.campaign_id,
+                   table.c.payment_amount, table.c.negotiated_amount, table.c.status, table.c.version)
+    ).first()
+
+    if updated is None:
+        db.session.rollback()
+        current = db.session.execute(
+            select(table.c.status, table.c.version, table.c.sender_id, table.c.receiver_id, last_actor.label('last_actor_id'))
+            .where(table.c.id == request_id)
+        ).first()
+        if current is None or user_id not in (current.sender_id, current.receiver_id):
+            raise TransitionError('Request not found.', 404)
+        state = {'status': current.status, 'version': current.version}
+        if current.version != version:
+            raise VersionConflict('The request was changed by someone else, reload and retry.', 409, state)
+        if status in RESPONSES and current.last_actor_id == user_id and TRANSITIONS[current.status]:
+            raise TransitionError(f'Only the other party can {status} this offer.', 403, state)
+        raise TransitionError(f'A request in status \'{current.status}\' cannot be changed that way.', 409, state)
+
+    touch(db.session, f'ad_requests:user:{updated.sender_id}', f'ad_requests:user:{updated.receiver_id}')
+    try:
+        if status == 'accept':
+            influencer_id, amount = payout_for(updated)
+            sponsor_id = updated.receiver_id if influencer_id == updated.sender_id else updated.sender_id
+            credit_request(influencer_id, updated.id, amount)
+            db.session.execute(insert(JoinedInfluencers).values(
+                user_id = influencer_id, request_id = updated.id, campaign_id = updated.campaign_id, payment_amount = amount
+            ).execution_options(cache_tags = ['campaigns:all', f'campaigns:sponsor:{sponsor_id}']))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return updated._asdict()
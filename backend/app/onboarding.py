@@ -0,0 +1,112 @@
+import csv, io
+from datetime import datetime
+from sqlalchemy import insert, select
+from .extensions import db
+from .hashing import hasher
+from .models import Users, Sponsors, Influencers
+
+ONBOARDING_MODELS = {
+    'sponsor': (Sponsors, ('username', 'email', 'password', 'entity_name', 'industry', 'budget')),
+    'influencer': (Influencers, ('username', 'email', 'password', 'first_name', 'last_name', 'dob', 'gender', 'niche', 'industry')),
+}
+
+class OnboardingError(Exception):
+    pass
+
+def parse_records(request):
+    '''Accepts a JSON array (or {"records": [...]}) or a CSV body / uploaded file.'''
+    upload = request.files.get('file')
+    if upload is not None or request.mimetype == 'text/csv':
+        text = upload.read().decode('utf-8-sig') if upload is not None else request.get_data(as_text = True)
+        return list(csv.DictReader(io.StringIO(text)))
+
+    data = request.get_json(silent = True)
+    if isinstance(data, dict):
+        data = data.get('records')
+    if not isinstance(data, list):
+        raise OnboardingError('Expected a JSON array of records or a CSV file.')
+    return data
+
+def _clean(record, fields, role):
+    row = {field: record.get(field) for field in fields}
+    missing = [field for field, value in row.items() if value in (None, '')]
+    if missing:
+        raise ValueError(f'Missing fields: {", ".join(missing)}.')
+
+    row['role'] = role
+    if role == 'sponsor':
+        row['budget'] = float(row['budget'])
+        row['approved'] = False
+    if role == 'influencer' and not isinstance(row['dob'], datetime):
+        row['dob'] = datetime.strptime(row['dob'], '%Y-%m-%d')
+    return row
+
+def _existing(column, values):
+    if not values:
+        return set()
+    return set(db.session.scalars(select(column).where(column.in_(values))))
+
+def bulk_onboard(role, records, batch_size = 500):
+    '''
+    Inserts sponsors or influencers in batches. Each batch costs one duplicate
+    check and one executemany INSERT per table; records that fail validation or
+    clash with an existing username/email (or sponsor entity name) are reported
+    back by their position and skipped.
+    '''
+    if role not in ONBOARDING_MODELS:
+        raise OnboardingError('Role must be either sponsor or influencer.')
+    model, fields = ONBOARDING_MODELS[role]
+    unique_fields = ('username', 'email', 'entity_name') if role == 'sponsor' else ('username', 'email')
+
+    created = 0
+    errors = []
+    seen = {field: set() for field in unique_fields}
+
+    for start in range(0, len(records), batch_size):
+        candidates = []
+        for position, record in enumerate(records[start:start + batch_size], start = start):
+            try:
+                row = _clean(record, fields, role)
+            except (AttributeError, TypeError, ValueError) as e:
+                errors.append({'index': position, 'error': str(e)})
+                continue
+            clash = next((field for field in unique_fields if row[field] in seen[field]), None)
+            if clash:
+                errors.append({'index': position, 'error': f'Duplicate {clash} \'{row[clash]}\' in upload.'})
+                continue
+            for field in unique_fields:
+                seen[field].add(row[field])
+            candidates.append((position, row))
+
+        taken = {
+            'username': _existing(Users.username, [row['username'] for _, row in candidates]),
+            'email': _existing(Users.email, [row['email'] for _, row in candidates]),
+        }
+        if role == 'sponsor':
+            taken['entity_name'] = _existing(Sponsors.entity_name, [row['entity_name'] for _, row in candidates])
+
+        rows = []
+        for position, row in candidates:
+            clash = next((field for field in unique_fields if row[field] in taken[field]), None)
+            if clash:
+                errors.append({'index': position, 'error': f'A user with this {clash} already exists.'})
+                continue
+            rows.append(row)
+
+        if not rows:
+            continue
+
+        for row, password_hash in zip(rows, hasher.generate_password_hashes([row['password'] for row in rows])):
+            row['password'] = password_hash
+            row['last_login_at'] = datetime.now()
+
+        try:
+            db.session.execute(insert(model), rows)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        created += len(rows)
+
+    errors.sort(key = lambda error: error['index'])
+    return {'created': created, 'failed': len(errors), 'errors': errors}
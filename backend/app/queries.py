@@ -0,0 +1,22 @@
+from flask import current_app
+from sqlalchemy import select
+from sqlalchemy.orm import selectin_polymorphic, with_polymorphic
+from .models import Users, Sponsors, Influencers
+
+USER_SUBTYPES = [Sponsors, Influencers]
+
+def polymorphic_users(mode = None):
+    '''
+    Returns (entity, options) for selecting Users together with their
+    Sponsors/Influencers columns. 'inline' joins the subtype tables into the
+    same SELECT; 'selectin' loads the base rows first and then each subtype
+    present in the page with one extra SELECT ... WHERE user_id IN (...).
+    '''
+    mode = mode or current_app.config.get('POLYMORPHIC_LOADING', 'selectin')
+    if mode == 'inline':
+        return with_polymorphic(Users, USER_SUBTYPES), ()
+    return Users, (selectin_polymorphic(Users, USER_SUBTYPES),)
+
+def select_users(*criteria, mode = None):
+    entity, options = polymorphic_users(mode)
+    return select(entity).options(*options).where(*criteria)
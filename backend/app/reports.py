@@ -0,0 +1,193 @@
+import click
+from flask import current_app
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from itertools import groupby
+from multiprocessing import get_context
+from operator import attrgetter
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from .extensions import db
+from .models import Sponsors, Campaigns, AdRequests, ReportCheckpoint
+from .mailer import send_batch
+from .email_templates import monthly_report
+
+CAMPAIGN_FIELDS = ('name', 'description', 'start_date', 'end_date', 'budget', 'visibility', 'goals',
+                   'campaign_reach', 'goals_met', 'expenditure')
+
+def monthly_report_statement(started_before, sponsor_ids = None, pending_period = None):
+    '''
+    Every sponsor with each of their campaigns started before the cutoff and
+    its expenditure (sum of ad request payments), in one statement ordered
+    by sponsor. Sponsors without such campaigns still get one row with NULL
+    campaign columns so they receive a (empty) report.
+    '''
+    expenditure = (
+        select(AdRequests.campaign_id, func.sum(AdRequests.payment_amount).label('expenditure'))
+        .group_by(AdRequests.campaign_id)
+        .subquery()
+    )
+    statement = (
+        select(Sponsors.id.label('sponsor_id'), Sponsors.username, Sponsors.email, Sponsors.entity_name,
+               Campaigns.id.label('campaign_id'), Campaigns.name, Campaigns.description, Campaigns.start_date,
+               Campaigns.end_date, Campaigns.budget, Campaigns.visibility, Campaigns.goals,
+               Campaigns.campaign_reach, Campaigns.goals_met, expenditure.c.expenditure)
+        .outerjoin(Campaigns, (Campaigns.sponsor_id == Sponsors.id) & (Campaigns.start_date < started_before))
+        .outerjoin(expenditure, expenditure.c.campaign_id == Campaigns.id)
+        .order_by(Sponsors.id, Campaigns.id)
+    )
+    if sponsor_ids is not None:
+        first_id, last_id = sponsor_ids
+        statement = statement.where(Sponsors.id.between(first_id, last_id))
+    if pending_period is not None:
+        statement = statement.where(~select(ReportCheckpoint.id).where(
+            ReportCheckpoint.sponsor_id == Sponsors.id, ReportCheckpoint.period == pending_period).exists())
+    return statement
+
+def sponsor_reports(started_before, sponsor_ids = None, pending_period = None, batch_size = 500):
+    '''
+    Yields (sponsor, campaign_details) one sponsor at a time. Rows are
+    streamed from the cursor in batches, so only the current sponsor's
+    campaigns are held in memory.
+    '''
+    rows = db.session.execute(monthly_report_statement(started_before, sponsor_ids, pending_period),
+                              execution_options = {'yield_per': batch_size})
+    for _, sponsor_rows in groupby(rows, key = attrgetter('sponsor_id')):
+        first = next(sponsor_rows)
+        campaign_details = [{field: getattr(row, field) for field in CAMPAIGN_FIELDS}
+                            for row in (first, *sponsor_rows) if row.campaign_id is not None]
+        yield first, campaign_details
+
+def sponsor_shards(shard_size):
+    '''(first_id, last_id) ranges of shard_size sponsors each, covering every sponsor.'''
+    last_id = 0
+    while True:
+        ids = db.session.scalars(
+            select(Sponsors.id).where(Sponsors.id > last_id).order_by(Sponsors.id).limit(shard_size)
+        ).all()
+        if not ids:
+            return
+        yield ids[0], ids[-1]
+        last_id = ids[-1]
+
+def claim_report(sponsor_id, period):
+    '''
+    Records that sponsor_id's report for period is being sent. The unique
+    (sponsor_id, period) constraint makes this the single point that decides
+    who sends it; False means another run already has.
+    '''
+    try:
+        db.session.execute(insert(ReportCheckpoint).values(sponsor_id = sponsor_id, period = period))
+        db.session.commit()
+        return True
+    except IntegrityError:
+        db.session.rollback()
+        return False
+
+def stale_claims(period, older_than, sponsor_ids = None):
+    '''
+    Sponsors whose report for period was claimed more than older_than seconds
+    ago and never marked sent: the run sending it died mid-send. Reruns skip
+    them, so they are reported until released with release_stale_claims.
+    '''
+    cutoff = datetime.now() - timedelta(seconds = older_than)
+    statement = select(ReportCheckpoint.sponsor_id).where(
+        ReportCheckpoint.period == period, ReportCheckpoint.status == 'claimed', ReportCheckpoint.claimed_at < cutoff)
+    if sponsor_ids is not None:
+        statement = statement.where(ReportCheckpoint.sponsor_id.between(*sponsor_ids))
+    return db.session.scalars(statement.order_by(ReportCheckpoint.sponsor_id)).all()
+
+def report_status(period, claim_timeout):
+    '''
+    The month's progress from the checkpoint table rather than from any one
+    run: reports sent, claims left stale, and sponsors with no report yet.
+    '''
+    cutoff = datetime.now() - timedelta(seconds = claim_timeout)
+    sent, stale, checkpointed = db.session.execute(
+        select(func.count().filter(ReportCheckpoint.status == 'sent'),
+               func.count().filter(ReportCheckpoint.status == 'claimed', ReportCheckpoint.claimed_at < cutoff),
+               func.count())
+        .where(ReportCheckpoint.period == period)
+    ).one()
+    sponsors = db.session.scalar(select(func.count(Sponsors.id)))
+    return {'sent': sent, 'stale': stale, 'unsent': sponsors - checkpointed}
+
+def release_stale_claims(period, older_than):
+    '''Drops stale claims so the next run sends those reports again; returns how many.'''
+    cutoff = datetime.now() - timedelta(seconds = older_than)
+    checkpoints = ReportCheckpoint.__table__
+    released = db.session.execute(delete(checkpoints).where(
+        checkpoints.c.period == period, checkpoints.c.status == 'claimed', checkpoints.c.claimed_at < cutoff)).rowcount
+    db.session.commit()
+    return released
+
+def send_shard(period, first_id, last_id):
+    '''
+    Sends the reports for one sponsor-id range. Sponsors with a checkpoint
+    for period are skipped, so rerunning a shard resumes where it stopped.
+    A report is claimed before it is sent and marked sent afterwards; a
+    failed send drops the claim so the next run retries it, while a crash
+    mid-send leaves it claimed rather than risk emailing the sponsor twice;
+    such claims are counted as stale once older than REPORT_CLAIM_TIMEOUT.
+    '''
+    one_month_ago = datetime.now() - timedelta(days = 30)
+    template = monthly_report()
+    counts = {'sent': 0, 'skipped': 0, 'failed': 0, 'stale': 0}
+    # The shard is read up front: claims are committed per sponsor, which would
+    # end a streaming cursor. Memory is bounded by the shard size.
+    reports = list(sponsor_reports(one_month_ago, (first_id, last_id), pending_period = period))
+    checkpoints = ReportCheckpoint.__table__
+    for sponsor, campaign_details in reports:
+        html = template.render(campaign_details, user = sponsor)
+        if not claim_report(sponsor.sponsor_id, period):
+            counts['skipped'] += 1
+            continue
+        _, failed = send_batch([(sponsor.email, 'Monthly Report', html)])
+        mine = (checkpoints.c.sponsor_id == sponsor.sponsor_id) & (checkpoints.c.period == period)
+        if failed:
+            db.session.execute(delete(checkpoints).where(mine))
+            counts['failed'] += 1
+        else:
+            db.session.execute(update(checkpoints).where(mine).values(status = 'sent', sent_at = datetime.now()))
+            counts['sent'] += 1
+        db.session.commit()
+    counts['stale'] = len(stale_claims(period, current_app.config['REPORT_CLAIM_TIMEOUT'], (first_id, last_id)))
+    return counts
+
+_local_app = None
+
+def _init_local_worker():
+    global _local_app
+    from . import create_app
+    _local_app = create_app()
+
+def _send_shard_locally(shard):
+    with _local_app.app_context():
+        return send_shard(*shard)
+
+def send_reports_locally(period, shard_size, processes):
+    '''Runs the shards on a local process pool instead of Celery workers.'''
+    shards = [(period, first_id, last_id) for first_id, last_id in sponsor_shards(shard_size)]
+    totals = {'sent': 0, 'skipped': 0, 'failed': 0, 'stale': 0}
+    with ProcessPoolExecutor(processes, mp_context = get_context('spawn'), initializer = _init_local_worker) as pool:
+        for counts in pool.map(_send_shard_locally, shards):
+            for key, value in counts.items():
+                totals[key] += value
+    return len(shards), totals
+
+def init_app(app):
+    @app.cli.command('send-monthly-reports')
+    @click.option('--period', default = None, help = 'YYYY-MM, defaults to the current month.')
+    @click.option('--processes', default = 4, show_default = True)
+    @click.option('--resend-stale', is_flag = True, help = 'Release stale claims first so those reports are sent again.')
+    def send_monthly_reports_command(period, processes, resend_stale):
+        period = period or datetime.now().strftime('%Y-%m')
+        if resend_stale:
+            print(f'Released {release_stale_claims(period, app.config["REPORT_CLAIM_TIMEOUT"])} stale claims.')
+        shards, totals = send_reports_locally(period, app.config['REPORT_SHARD_SIZE'], processes)
+        print(f'Monthly reports for {period} in {shards} shards: {totals["sent"]} sent, '
+              f'{totals["skipped"]} already sent, {totals["failed"]} failed.')
+        stale = stale_claims(period, app.config['REPORT_CLAIM_TIMEOUT'])
+        if stale:
+            print(f'{len(stale)} reports were claimed but never sent (sponsors {", ".join(map(str, stale))}); '
+                  f'rerun with --resend-stale to send them.')
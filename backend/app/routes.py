@@ -1,14 +1,37 @@
-from flask import request, jsonify, make_response, url_for
+from flask import Blueprint, request, jsonify, make_response, url_for, Response, current_app, send_file
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity, unset_jwt_cookies
 from .models import *
+from .hashing import hasher, HashingBusy
+from .last_login import last_login_buffer
+from .onboarding import bulk_onboard, parse_records, OnboardingError
+from .queries import select_users
+from .pagination import paginate_request
+from .serializers import select_fields, rows_to_dicts, dumps, json_response
+from .cache_tags import cached
+from .conditional import listing_etag, conditional_response
+from .discovery import influencer_index
+from .search import campaign_search
+from .dashboard import get_snapshot, summarize
+from .ad_requests import send_requests, AdRequestError, _amount
+from .earnings import get_earnings
+from .negotiation import apply_change, expected_version, TransitionError
+from .campaign_overview import overview_select, overview_dicts
+from .exports import start_export, get_export, mark_failed, filename, ExportError, EXPORT_FORMATS
+from .tasks import export_data, render_admin_charts
+from .charts import current_charts, chart_path, RENDER_REQUEST_TTL
+from .extensions import cache
 from datetime import date, datetime
-import matplotlib.pyplot as plt
+import os
+import re
+import time
 
-@app.route('/')
+main = Blueprint('main', __name__)
+
+@main.route('/')
 def home():
     return jsonify({"message": "Welcome to AdVeri!"}), 200
     
-@app.route('/register', methods = ['POST'])
+@main.route('/register', methods = ['POST'])
 def register():
     data = request.get_json()
 
@@ -20,7 +43,7 @@ def register():
     if not all([username, email, password, role]):
         return jsonify({"message": "All fields are required!"}), 400
     
-    user = Users.query.filter_by(username == username, email == email).first()
+    user = Users.query.filter((Users.username == username) | (Users.email == email)).first()
 
     if user:
         return jsonify({"error": "User with already exists!"}), 409
@@ -28,46 +51,42 @@ def register():
     try:
         if role == "sponsor":
             try:
-                new_user = Users(username = username, email = email, password = password, role = role, approved = False)
-                db.session.add(new_user)
-                db.session.commit()
-
-                entity_name = data.get('entity_name')
-                industry = data.get('industry')
-                budget = data.get('budget')
-                new_sponsor = Sponsors(user_id = new_user.user_id, entity_name = entity_name, industry = industry, budget = budget)
+                new_sponsor = Sponsors(username = username, email = email, password = password, role = role,
+                                       entity_name = data.get('entity_name'), industry = data.get('industry'),
+                                       budget = data.get('budget'))
                 db.session.add(new_sponsor)
                 db.session.commit()
                 return jsonify({"message": "New sponsor added successfully!"}), 200
+            except HashingBusy:
+                db.session.rollback()
+                return jsonify({"error": "Registrations are busy right now, please try again shortly."}), 503, {'Retry-After': '1'}
             except Exception as e:
                 db.session.rollback()
                 return jsonify({"error": f"Some error occured while registering the sponsor. {str(e)}"}), 500
 
         if role == "influencer":
             try:
-                new_user = Users(username = username, email = email, password = password, role = role)
-                db.session.add(new_user)
-                db.session.commit()
-
-                first_name = data.get('first_name')
-                last_name = data.get('last_name')
-                dob = data.get('dob')
-                gender = data.get('gender')
-                niche = data.get('niche')
-                industry = data.get('industry')
-                new_influencer = Influencers(user_id = new_user.user_id, first_name = first_name, last_name = last_name, 
-                                             dob = dob, gender = gender, industry = industry, niche = niche)
+                dob = datetime.strptime(data.get('dob'), '%Y-%m-%d') if data.get('dob') else None
+                new_influencer = Influencers(username = username, email = email, password = password, role = role,
+                                             first_name = data.get('first_name'), last_name = data.get('last_name'),
+                                             dob = dob, gender = data.get('gender'), industry = data.get('industry'),
+                                             niche = data.get('niche'))
                 db.session.add(new_influencer)
                 db.session.commit()
                 return jsonify({"message": "New influencer added successfully!"}), 200
+            except HashingBusy:
+                db.session.rollback()
+                return jsonify({"error": "Registrations are busy right now, please try again shortly."}), 503, {'Retry-After': '1'}
             except Exception as e:
                 db.session.rollback()
                 return jsonify({"error": f"Some error occured while registering the influencer. {str(e)}"}), 500
+
+        return jsonify({"error": "Role must be either sponsor or influencer."}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": f"Some error occured: {str(e)}"}), 500
 
-@app.route('/login', methods = ['POST'])
+@main.route('/login', methods = ['POST'])
 def login():
     data = request.get_json()
     username = data.get('username')
@@ -77,7 +96,12 @@ def login():
     if not user:
         return jsonify({"error": "User not found, try registering as a new user!"}), 404
     
-    if not bcrypt.check_password_hash(user.password, password):
+    try:
+        password_matches = hasher.check_password_hash(user.password, password)
+    except HashingBusy:
+        return jsonify({"error": "Too many login attempts right now, please try again shortly."}), 503, {'Retry-After': '1'}
+
+    if not password_matches:
         return jsonify({"error": "Incorrect password!"}), 401
     
     if user.role == 'sponsor' and user.approved == False:\
@@ -86,14 +110,14 @@ def login():
     access_token = create_access_token(identity = {
         'id': user.id,
         'role': user.role,
-        'verified': user.verified
+        'approved': user.approved
     })
 
-    user.last_login_at = datetime.now()
+    last_login_buffer.record(user.id)
 
     return jsonify({"message": "Login successful!", "access_token": access_token}), 200
 
-@app.route('/logout', methods = ['POST'])
+@main.route('/logout', methods = ['POST'])
 def logout():
     response = jsonify({'message': 'Logout successful!'})
     unset_jwt_cookies(response)
@@ -101,33 +125,78 @@ def logout():
 
 '''------------------------ADMIN-ROUTES------------------------'''
 
-@app.route('/admin/sponsor_applications', methods = ['GET'])
-@jwt_required
+@main.route('/admin/dashboard', methods = ['GET'])
+@jwt_required()
+def admin_dashboard():
+    current_user = get_jwt_identity()
+    if current_user['role'] != 'admin':
+        return jsonify({"error": "You are not authorized to access this page!"}), 401
+
+    return json_response(summarize(get_snapshot()))
+
+@main.route('/admin/charts', methods = ['GET'])
+@jwt_required()
+def admin_charts():
+    current_user = get_jwt_identity()
+    if current_user['role'] != 'admin':
+        return jsonify({"error": "You are not authorized to access this page!"}), 401
+
+    charts = current_charts(current_app.config['CHART_DIR'])
+    missing = sorted(digest for digest, rendered in charts.values() if not rendered)
+    # cache.add only succeeds for the first poll, so one render is queued per set of missing charts.
+    if missing and cache.add(f'charts:render:{",".join(missing)}', True, timeout = RENDER_REQUEST_TTL):
+        render_admin_charts.delay()
+    return jsonify({name: {'url': url_for('main.admin_chart', digest = digest) if rendered else None, 'ready': rendered}
+                    for name, (digest, rendered) in charts.items()}), 200
+
+@main.route('/admin/charts/<digest>.png', methods = ['GET'])
+@jwt_required()
+def admin_chart(digest):
+    current_user = get_jwt_identity()
+    if current_user['role'] != 'admin':
+        return jsonify({"error": "You are not authorized to access this page!"}), 401
+
+    if not re.fullmatch(r'[0-9a-f]{32}', digest):
+        return jsonify({'error': 'Chart not found.'}), 404
+    path = chart_path(current_app.config['CHART_DIR'], digest)
+    if not os.path.exists(path):
+        return jsonify({'error': 'Chart not found.'}), 404
+    # The URL names the chart's content, so it never changes once rendered.
+    response = send_file(path, mimetype = 'image/png', etag = digest, conditional = True)
+    response.headers['Cache-Control'] = 'private, max-age=31536000, immutable'
+    return response
+
+@main.route('/admin/sponsor_applications', methods = ['GET'])
+@jwt_required()
 def view_sponsor_applications():
     current_user = get_jwt_identity()
-    if not current_user.role == 'admin':
+    if current_user['role'] != 'admin':
         return jsonify({"error": "You are not authorized to access this page!"}), 401
     
-    sponsor_appltns = Sponsors.query.join(Users).filter(Users.id == Sponsors.user_id, Users.approved == False).all()
-
-    sponsor_applications = [
-        {
-            'id': sponsor.id,
-            'username': sponsor.username,
-            'email': sponsor.email,
-            'entity_name': sponsor.entity_name,
-            'industry': sponsor.industry,
-            'budget': sponsor.budget
-        }
-        for sponsor in sponsor_appltns
-    ]
-    return jsonify({'sponsor_applications': sponsor_applications}), 200
-
-@app.route('/admin/approve_sponsor/<int:sponsor_id>', methods = ['PUT', 'DELETE'])
+    page = paginate_request(select_fields(Sponsors, ('id', 'username', 'email', 'entity_name', 'industry', 'budget'))
+                            .where(Users.role == 'sponsor', Users.approved == False), Users.id, scalars = False)
+
+    return json_response({'sponsor_applications': rows_to_dicts(page.items), 'page': page.meta()})
+
+@main.route('/admin/manage_users', methods = ['GET'])
+@jwt_required()
+def admin_manage_users():
+    current_user = get_jwt_identity()
+    if current_user['role'] != 'admin':
+        return jsonify({'error': 'You are not authorised to access the page.'}), 401
+
+    criteria = [Users.role != 'admin']
+    if request.args.get('role'):
+        criteria.append(Users.role == request.args['role'])
+
+    page = paginate_request(select_users(*criteria), Users.id)
+    return jsonify({'users': [user.to_dict() for user in page.items], 'page': page.meta()}), 200
+
+@main.route('/admin/approve_sponsor/<int:sponsor_id>', methods = ['PUT', 'DELETE'])
 @jwt_required()
 def approve_sponsor(sponsor_id):
     current_user = get_jwt_identity()
-    if current_user.role == 'admin':
+    if current_user['role'] != 'admin':
         return jsonify({'error': 'You are not authorised to access the page.'}), 401
     
     try:
@@ -151,13 +220,32 @@ def approve_sponsor(sponsor_id):
         db.session.rollback()
         return jsonify({'error': f'Some error occured. {str(e)}'}), 400
     
+@main.route('/admin/bulk_onboard/<string:role>', methods = ['POST'])
+@jwt_required()
+def admin_bulk_onboard(role):
+    current_user = get_jwt_identity()
+    if current_user['role'] != 'admin':
+        return jsonify({'error': 'You are not authorised to access the page.'}), 401
+
+    try:
+        records = parse_records(request)
+        result = bulk_onboard(role, records, batch_size = request.args.get('batch_size', 500, type = int))
+    except OnboardingError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Some error occured while onboarding. {str(e)}'}), 500
+
+    if result['errors']:
+        return jsonify(result), 207 if result['created'] else 400
+    return jsonify(result), 200
+    
 '''------------------------SPONSOR-ROUTES------------------------'''
 
-@app.route('/sponsor/create_campaign', methods = ['POST'])
+@main.route('/sponsor/create_campaign', methods = ['POST'])
 @jwt_required()
 def create_campaign():
     current_user = get_jwt_identity()
-    if current_user.role == 'sponsor':
+    if current_user['role'] != 'sponsor':
         return jsonify({'error': 'You are not authorised to access the page.'}), 401
 
     data = request.json
@@ -177,9 +265,14 @@ def create_campaign():
         return jsonify({'error': 'All fields are required!'}), 400
 
     try:
-        new_campaign = Campaigns(name = name, description = description, start_date = start_date,
-                                    end_date = end_date, budget = budget, goals = goals,
-                                    visibility = visibility)
+        start_date, end_date = datetime.fromisoformat(start_date), datetime.fromisoformat(end_date)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Dates must be in YYYY-MM-DD format.'}), 400
+
+    try:
+        new_campaign = Campaigns(sponsor_id = current_user['id'], name = name, description = description,
+                                 start_date = start_date, end_date = end_date, budget = budget, goals = goals,
+                                 visibility = visibility)
         db.session.add(new_campaign)
         db.session.commit()
         return jsonify({'message': 'Campaign created successfully!'}), 200
@@ -188,21 +281,27 @@ def create_campaign():
         db.session.rollback()
         return jsonify({'error': f'Some error occured. {str(e)}'}), 400
 
-@app.route('/sponsor/edit_campaign/<int:campaign_id>', methods = ['GET', 'PUT', 'DELETE'])
-@jwt_required
+@main.route('/sponsor/edit_campaign/<int:campaign_id>', methods = ['GET', 'PUT', 'DELETE'])
+@jwt_required()
 def edit_campaign(campaign_id):
     current_user = get_jwt_identity()
-    if not current_user.role == 'sponsor':
+    if current_user['role'] != 'sponsor':
          return jsonify({'error': 'You are not authorized to access the page!'}), 401
     
     if request.method == 'GET':
-        campaigns = Campaigns.query.filter_by(sponsor_id = current_user.id).all()
+        sponsor_id = current_user['id']
 
-        if not campaigns: 
-            return jsonify({'error': 'Campaign not found.'})
+        def listing():
+            page = paginate_request(overview_select(Campaigns.sponsor_id == sponsor_id), Campaigns.id, scalars = False)
 
-        
-        return jsonify({'campaigns': [campaign.to_dict() for campaign in campaigns]}), 200
+            if not page.items: 
+                return make_response(jsonify({'error': 'Campaign not found.'}))
+
+            return json_response({'campaigns': overview_dicts(page.items), 'page': page.meta()})
+
+        window = int(time.time() // current_app.config['CAMPAIGN_ETAG_WINDOW'])
+        etag = listing_etag('campaigns', f'campaigns:sponsor:{sponsor_id}', extra = (sponsor_id, window))
+        return conditional_response(etag, listing)
 
     if request.method == 'PUT':
         campaign = Campaigns.query.get(campaign_id)
@@ -235,20 +334,107 @@ def edit_campaign(campaign_id):
             db.session.rollback()
             return jsonify({'error': f'Some error occured. {str(e)}'}), 400
 
+@main.route('/sponsor/search_influencers', methods = ['GET'])
+@jwt_required()
+def search_influencers():
+    current_user = get_jwt_identity()
+    if current_user['role'] != 'sponsor':
+        return jsonify({'error': 'You are not authorized to access the page!'}), 401
+
+    limit = min(request.args.get('limit', 20, type = int), 100)
+    influencers = influencer_index.search(niche = request.args.get('niche'), industry = request.args.get('industry'),
+                                          platform = request.args.get('platform'),
+                                          min_reach = request.args.get('min_reach', 0, type = int), k = limit)
+    return json_response({'influencers': influencers})
+
 '''------------------------INFLUENCER-ROUTES-------------------'''
 
+@main.route('/influencer/earnings', methods = ['GET'])
+@jwt_required()
+def influencer_earnings():
+    current_user = get_jwt_identity()
+    if current_user['role'] != 'influencer':
+        return jsonify({'error': 'You are not authorized to access this page!'}), 401
+
+    earnings = get_earnings(current_user['id'])
+    if earnings is None:
+        return jsonify({'error': 'Influencer not found.'}), 404
+    return jsonify({'earnings': earnings}), 200
+
 '''---------------------COMMON-ROUTES--------------------------'''
-@app.route('/<int:campaign_id>/send_request', methods = ['POST'])
-@jwt_required
+@main.route('/exports', methods = ['POST'])
+@jwt_required()
+def create_export():
+    current_user = get_jwt_identity()
+    if current_user['role'] not in ['admin', 'sponsor']:
+        return jsonify({'error': 'You are not authorized to access this page!'}), 401
+
+    data = request.get_json(silent = True) or {}
+    try:
+        job = start_export(current_user['id'], data.get('format', 'csv'), data.get('compress', False))
+    except ExportError as e:
+        return jsonify({'error': str(e)}), e.status
+
+    try:
+        export_data.delay(job.id)
+    except Exception as e:
+        # Nothing will ever pick the job up, so it must not stay pending.
+        mark_failed(job.id, f'Could not queue the export: {e}')
+        return jsonify({'error': 'Exports are unavailable right now, please try again shortly.',
+                        'export': job.to_dict()}), 503, {'Retry-After': '30'}
+    return jsonify({'export': job.to_dict(), 'status_url': url_for('main.export_status', job_id = job.id)}), 202
+
+@main.route('/exports/<int:job_id>', methods = ['GET'])
+@jwt_required()
+def export_status(job_id):
+    current_user = get_jwt_identity()
+    try:
+        job = get_export(job_id, current_user['id'], current_user['role'])
+    except ExportError as e:
+        return jsonify({'error': str(e)}), e.status
+
+    response = {'export': job.to_dict()}
+    if job.status == 'done':
+        response['download_url'] = url_for('main.download_export', job_id = job.id)
+    return jsonify(response), 200
+
+@main.route('/exports/<int:job_id>/download', methods = ['GET'])
+@jwt_required()
+def download_export(job_id):
+    current_user = get_jwt_identity()
+    try:
+        job = get_export(job_id, current_user['id'], current_user['role'])
+    except ExportError as e:
+        return jsonify({'error': str(e)}), e.status
+
+    if job.status != 'done' or not job.path or not os.path.exists(job.path):
+        return jsonify({'error': f'Export is {job.status}.', 'export': job.to_dict()}), 409
+    # send_file streams the file from disk in blocks and answers Range requests.
+    return send_file(job.path, mimetype = 'application/gzip' if job.compressed else EXPORT_FORMATS[job.format],
+                     as_attachment = True, download_name = filename(job), conditional = True)
+
+@main.route('/campaigns/search', methods = ['GET'])
+@jwt_required()
+def search_campaigns():
+    current_user = get_jwt_identity()
+    if current_user['role'] not in ['admin', 'sponsor', 'influencer']:
+        return jsonify({'error': 'You are not authorized to access this page!'}), 401
+
+    limit = min(request.args.get('limit', 20, type = int), 100)
+    campaigns = campaign_search.search(request.args.get('q', ''), current_user['role'], current_user['id'], limit = limit)
+    return json_response({'campaigns': overview_dicts(campaigns)})
+
+@main.route('/<int:campaign_id>/send_request', methods = ['POST'])
+@jwt_required()
 def spn_send_request(campaign_id):
     current_user = get_jwt_identity()
-    if not current_user.role == 'sponsor':
+    if current_user['role'] != 'sponsor':
         return jsonify({'error': 'You are not authorised to access this page!'}), 401
     
     data = request.json
     receiver_id = data.get('receiver_id')
-    sender_id = current_user.id
-    sent_by = current_user.role
+    sender_id = current_user['id']
+    sent_by = current_user['role']
     message = data.get('message')
     requirements = data.get('requirements')
     payment_amount = data.get('payment_amount')
@@ -261,59 +447,84 @@ def spn_send_request(campaign_id):
     if exisiting_request:
         return jsonify({'message': f'Request already exists between this campaign and receiver'}), 409
     
-    new_request = AdRequests(campaign_id = campaign_id, sender_id = sender_id, receiver_id = receiver_id, sender_id = sender_id,
-                             sent_by = sent_by, message = message, requirements = requirements, payment_amount = payment_amount)
+    new_request = AdRequests(campaign_id = campaign_id, sender_id = sender_id, receiver_id = receiver_id,
+                             sent_by = sent_by, message = message, requirements = requirements, payment_amount = payment_amount,
+                             status = 'pending')
     db.session.add(new_request)
     db.session.commit()
     return jsonify({'message': 'Request sent successfully!'}), 200
 
-@app.route('/edit_request/<int:request_id>', methods = ['GET', 'PUT', 'DELETE'])
-@jwt_required
+@main.route('/sponsor/send_requests', methods = ['POST'])
+@jwt_required()
+def spn_send_requests():
+    current_user = get_jwt_identity()
+    if current_user['role'] != 'sponsor':
+        return jsonify({'error': 'You are not authorised to access this page!'}), 401
+
+    data = request.get_json() or {}
+    campaign_id = data.get('campaign_id')
+    items = data.get('requests') or data.get('influencer_ids')
+
+    if not campaign_id or not items:
+        return jsonify({'error': 'Please select a campaign and at least one influencer.'}), 400
+
+    try:
+        result = send_requests(current_user['id'], campaign_id, items, defaults = data.get('defaults'))
+    except AdRequestError as e:
+        return jsonify({'error': str(e)}), e.status
+    except Exception as e:
+        return jsonify({'error': f'Some error occured. {str(e)}'}), 400
+
+    if result['failed'] or result['skipped']:
+        return jsonify(result), 207 if result['sent'] else 409
+    return jsonify(result), 200
+
+@main.route('/edit_request/<int:request_id>', methods = ['GET', 'PUT', 'DELETE'])
+@jwt_required()
 def spn_edit_request(request_id):
     current_user = get_jwt_identity()
-    if not current_user.role == 'sponsor':
+    # Influencers edit and answer the requests they are part of; only sponsors delete them.
+    if current_user['role'] not in ['sponsor', 'influencer'] or (request.method == 'DELETE' and current_user['role'] != 'sponsor'):
         return jsonify({'error': 'You are nto authorized to access this page!'}), 403
     
     try: 
         if request.method == 'GET':
-            sent_requests = AdRequests.query.filter_by(sender_id = current_user.id).all()
-            received_requests = AdRequests.query.filter_by(receiver_id = current_user.id).all()
-
-            message = ''
-
-            if not sent_requests:
-                message = make_response(jsonify({'message': 'You haven\'t received any requests.'}), 200)
-            if not received_requests:
-                message = make_response(jsonify({'message': 'You haven\'t sent any requests.'}), 200)
-            if not all([sent_requests, received_requests]):
-                message = make_response(jsonify({'error': 'No request found.'}), 409)
-
-            message = make_response(jsonify({'sent_requests': sent_requests, 'received_requests': received_requests}), 200)
-
-            return message
+            user_id = current_user['id']
+
+            def listing():
+                sent_page = paginate_request(select_fields(AdRequests).where(AdRequests.sender_id == user_id),
+                                             AdRequests.id, prefix = 'sent_', scalars = False)
+                received_page = paginate_request(select_fields(AdRequests).where(AdRequests.receiver_id == user_id),
+                                                 AdRequests.id, prefix = 'received_', scalars = False)
+                return dumps({'sent_requests': rows_to_dicts(sent_page.items), 'received_requests': rows_to_dicts(received_page.items),
+                              'sent_page': sent_page.meta(), 'received_page': received_page.meta()})
+
+            # Cached per user and query string until one of their requests changes.
+            def response():
+                body = cached(f'ad_requests:listing:{user_id}:{request.query_string.decode()}',
+                              [f'ad_requests:user:{user_id}'], listing)
+                return Response(body, mimetype = 'application/json')
+
+            etag = listing_etag('ad_requests', f'ad_requests:user:{user_id}', extra = (user_id,))
+            return conditional_response(etag, response)
         
         if request.method == 'PUT':
-            ad_request = AdRequests.query.get(request_id)
-            if not ad_request:
-                return jsonify({'error': 'Request not found.'}), 404
-
             data = request.json
-            ad_request.message = data.get('message', ad_request.message)
-            ad_request.requirement = data.get('requirement', ad_request.requirement)
-            ad_request.payment_amount = data.get('payment_amount', ad_request.payment_amount)
-            ad_request.status = data.get('status', ad_request.status)
-
-            if ad_request.status == 'accept':
-                if ad_request.sent_by == 'sponsor':
-                    influencer = Users.query.join(Influencers).filter_by(Users.id == Influencers.user_id, Users.id == ad_request.receiver_id).first()
-                    influencer.earnings += ad_request.negotiated_amount if ad_request.negotiated_amount else ad_request.payment_amount
-
-                if ad_request.sent_by == 'influencer':
-                    influencer = Users.query.join(Influencers).filter_by(Users.id == Influencers.user_id, Users.id == ad_request.sender_id).first()
-                    influencer.earnings += ad_request.negotiated_amount if ad_request.negotiated_amount else ad_request.payment_amount
-        
-            db.session.commit()
-            return jsonify({'message': 'Request updated successfullly!'}), 200
+            payment_amount = data.get('payment_amount')
+            if payment_amount is not None:
+                payment_amount = _amount(payment_amount)
+                if payment_amount is None:
+                    return jsonify({'error': 'The payment amount must be a positive number.'}), 400
+            try:
+                ad_request = apply_change(request_id, current_user['id'], expected_version(request, data),
+                                          status = data.get('status'), message = data.get('message'),
+                                          requirements = data.get('requirements'),
+                                          payment_amount = payment_amount)
+            except TransitionError as e:
+                return jsonify({'error': str(e), 'current': e.current}), e.status
+
+            return jsonify({'message': 'Request updated successfullly!', 'status': ad_request['status'],
+                            'version': ad_request['version']}), 200
         
         if request.method == 'DELETE':
             ad_request = AdRequests.query.get(request_id)
@@ -327,28 +538,30 @@ def spn_edit_request(request_id):
         db.session.rollback()
         return jsonify({'error': f'Some error occured. {str(e)}'}), 400
 
-@app.route('/negotiate_payment_amount/<int:request_id>', methods = ['PUT'])
-@jwt_required
+@main.route('/negotiate_payment_amount/<int:request_id>', methods = ['PUT'])
+@jwt_required()
 def negotiate_payment_amount(request_id):
     current_user = get_jwt_identity()
-    if not current_user.role in ['sponsor', 'influencer'] or not current_user.approved:
+    # Sponsors are only issued tokens once approved; influencers need no approval.
+    if current_user['role'] not in ['sponsor', 'influencer']:
         return jsonify({'error': 'You are not authorized to access this page!'}), 401
     
     try:
-        ad_request = AdRequests.query.get(request_id)
-
-        if not ad_request:
-            return jsonify({'error': 'Request not found.'}), 404
-            
         data = request.json
-        ad_request.negotiated_amount = data.get('negotiated_amount', ad_request.negotiated_amount)
-        ad_request.status = 'negotiation' if  ad_request.negotiated_amount else ad_request.status
+        negotiated_amount = _amount(data.get('negotiated_amount'))
+        if negotiated_amount is None:
+            return jsonify({'error': 'A positive negotiated amount is required.'}), 400
 
-        db.session.commit()
-        return jsonify({'message': 'Request status updated successfully!'}), 200        
+        ad_request = apply_change(request_id, current_user['id'], expected_version(request, data),
+                                  status = 'negotiation', negotiated_amount = negotiated_amount)
+        return jsonify({'message': 'Request status updated successfully!', 'status': ad_request['status'],
+                        'version': ad_request['version']}), 200        
+
+    except TransitionError as e:
+        return jsonify({'error': str(e), 'current': e.current}), e.status
 
 
     except Exception as e:
         db.session.rollback()
-        return jsonify({'error': f'Some error occured {str(e)}'})
+        return jsonify({'error': f'Some error occured {str(e)}'}), 500
 
@@ -0,0 +1,106 @@
+import re
+from sqlalchemy import and_, literal_column, or_, select, table, column, text
+from .extensions import db
+from .models import Campaigns
+from .serializers import columns
+from .campaign_overview import overview_columns
+
+campaigns_fts = table('campaigns_fts', column('rowid'))
+
+FTS_SCHEMA = [
+    '''CREATE VIRTUAL TABLE campaigns_fts USING fts5(
+        name, description, content = 'campaigns', content_rowid = 'id',
+        tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )''',
+    '''CREATE TRIGGER IF NOT EXISTS campaigns_fts_insert AFTER INSERT ON campaigns BEGIN
+        INSERT INTO campaigns_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS campaigns_fts_delete AFTER DELETE ON campaigns BEGIN
+        INSERT INTO campaigns_fts(campaigns_fts, rowid, name, description) VALUES ('delete', old.id, old.name, old.description);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS campaigns_fts_update AFTER UPDATE OF name, description ON campaigns BEGIN
+        INSERT INTO campaigns_fts(campaigns_fts, rowid, name, description) VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO campaigns_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END''',
+]
+
+class CampaignSearch:
+    '''
+    Campaign full-text search. On SQLite builds with FTS5 an external-content
+    FTS table mirrors campaigns.name/description and is kept in sync by
+    triggers, so bulk statements are covered as well. Other databases, or
+    SQLite without FTS5, fall back to ILIKE matching.
+    '''
+    def __init__(self):
+        self.fts_enabled = False
+
+    def init_app(self, app):
+        app.extensions['campaign_search'] = self
+
+    def setup(self):
+        self.fts_enabled = False
+        if db.engine.dialect.name != 'sqlite':
+            return
+        with db.engine.begin() as connection:
+            if not connection.exec_driver_sql("SELECT sqlite_compileoption_used('ENABLE_FTS5')").scalar():
+                return
+            exists = connection.exec_driver_sql(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'campaigns_fts'").scalar()
+            for statement in FTS_SCHEMA[0 if not exists else 1:]:
+                connection.exec_driver_sql(statement)
+            if not exists:
+                connection.exec_driver_sql("INSERT INTO campaigns_fts(campaigns_fts) VALUES ('rebuild')")
+        self.fts_enabled = True
+
+    @staticmethod
+    def tokens(query):
+        return re.findall(r'\w+', query or '')[:10]
+
+    def _visibility(self, role, user_id):
+        if role == 'influencer':
+            return Campaigns.visibility == 'public'
+        if role == 'sponsor':
+            return or_(Campaigns.visibility == 'public', Campaigns.sponsor_id == user_id)
+        return None
+
+    def statement(self, query, role, user_id = None, limit = 20):
+        '''
+        Every token must match, the last one as a prefix so results follow
+        the user's typing. FTS results are ordered by bm25 with name hits
+        weighted above description hits.
+        '''
+        tokens = self.tokens(query)
+        if not tokens:
+            return None
+
+        if self.fts_enabled:
+            match = ' '.join(f'"{token}"' for token in tokens[:-1]) + f' "{tokens[-1]}"*'
+            statement = (
+                select(*columns(Campaigns), *overview_columns())
+                .join_from(campaigns_fts, Campaigns, Campaigns.id == campaigns_fts.c.rowid)
+                .where(text('campaigns_fts MATCH :match').bindparams(match = match.strip()))
+                .order_by(literal_column('bm25(campaigns_fts, 10.0, 1.0)'))
+            )
+        else:
+            patterns = [f'%{token}%' for token in tokens]
+            statement = (
+                select(*columns(Campaigns), *overview_columns())
+                .where(and_(*[or_(Campaigns.name.ilike(pattern), Campaigns.description.ilike(pattern)) for pattern in patterns]))
+                .order_by(Campaigns.id)
+            )
+
+        visibility = self._visibility(role, user_id)
+        if visibility is not None:
+            statement = statement.where(visibility)
+        return statement.limit(limit)
+
+    def search(self, query, role, user_id = None, limit = 20):
+        statement = self.statement(query, role, user_id, limit)
+        if statement is None:
+            return []
+        return db.session.execute(statement).all()
+
+campaign_search = CampaignSearch()
+
+def init_app(app):
+    campaign_search.init_app(app)
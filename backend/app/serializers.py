@@ -0,0 +1,47 @@
+import json
+from datetime import date, datetime
+from flask import Response
+from sqlalchemy import select
+from .models import Users, Sponsors, Influencers, InfluencerPlatform, Campaigns, AdRequests, JoinedInfluencers, EarningsLedger
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Columns exposed by the API per model. List endpoints select exactly these
+# columns and get plain rows back, so no ORM instances are built per row.
+FIELDS = {
+    Users: ('id', 'username', 'email', 'role', 'approved', 'is_flagged', 'last_login_at'),
+    Sponsors: ('id', 'username', 'email', 'approved', 'is_flagged', 'entity_name', 'industry', 'budget'),
+    Influencers: ('id', 'username', 'email', 'is_flagged', 'first_name', 'last_name', 'dob', 'gender', 'niche', 'industry', 'earnings'),
+    InfluencerPlatform: ('id', 'user_id', 'platform', 'reach'),
+    Campaigns: ('id', 'sponsor_id', 'name', 'description', 'start_date', 'end_date', 'budget', 'goals',
+                'visibility', 'campaign_reach', 'goals_met'),
+    AdRequests: ('id', 'sent_by', 'sender_id', 'receiver_id', 'campaign_id', 'message', 'requirements',
+                 'payment_amount', 'negotiated_amount', 'status', 'version'),
+    JoinedInfluencers: ('id', 'user_id', 'request_id', 'campaign_id', 'payment_amount'),
+    EarningsLedger: ('id', 'influencer_id', 'request_id', 'amount', 'created_at', 'is_rollup'),
+}
+
+def columns(model, fields = None):
+    return [getattr(model, field) for field in fields or FIELDS[model]]
+
+def select_fields(model, fields = None):
+    return select(*columns(model, fields)).select_from(model)
+
+def rows_to_dicts(rows):
+    return [row._asdict() for row in rows]
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+def dumps(payload):
+    if orjson is not None:
+        return orjson.dumps(payload, default = _default)
+    return json.dumps(payload, default = _default, separators = (',', ':')).encode()
+
+def json_response(payload, status = 200, headers = None):
+    return Response(dumps(payload), status = status, headers = headers, mimetype = 'application/json')
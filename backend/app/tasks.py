@@ -1,53 +1,145 @@
 from .workers import celery
-from models import *
+from .models import *
+from .earnings import rollup_ledger
+from .reports import sponsor_shards, send_shard, release_stale_claims, report_status
+from .exports import run_export, purge_exports
+from .charts import render_charts
+from celery import chord
+from celery.exceptions import MaxRetriesExceededError
 from celery.schedules import crontab
 from datetime import datetime, timedelta
-from .mailer import send_email
-from flask import render_template
-from sqlalchemy import func
+from .mailer import send_batch
+from .email_templates import daily_reminder
+from flask import current_app
+from sqlalchemy import select
 
 @celery.on_after_finalize.connect
 def setup_peridioc_tasks(sender, **kwargs):
     sender.add_periodic_task(crontab(hour = 9, minute = 00), send_daily_email.s(), name = 'Daily Emails')
     sender.add_periodic_task(crontab(day_of_month = 1, hour = 9, minute = 00), send_monthly_email.s(), name = 'Monthly Emails')
+    sender.add_periodic_task(crontab(hour = 3, minute = 00), rollup_earnings_ledger.s(), name = 'Earnings Ledger Rollup')
+    sender.add_periodic_task(crontab(minute = 30), purge_old_exports.s(), name = 'Export Cleanup')
+    sender.add_periodic_task(crontab(minute = '*/10'), render_admin_charts.s(), name = 'Admin Charts')
+
+REMINDER_MESSAGE = 'Hey! You are receiving this email since you haven\'t logged into AdVeri for the past 24 hours. Check in to see your progress in your ventures!'
+
+def inactive_user_ids(cutoff, batch_size):
+    '''Yields ids of inactive non-admin users in keyset batches of batch_size.'''
+    last_id = 0
+    while True:
+        ids = db.session.scalars(
+            select(Users.id)
+            .where(Users.last_login_at < cutoff, Users.role != 'admin', Users.id > last_id)
+            .order_by(Users.id)
+            .limit(batch_size)
+        ).all()
+        if not ids:
+            return
+        yield ids
+        last_id = ids[-1]
 
 @celery.task
 def send_daily_email():
-    inactive_users = Users.query.filter(Users.last_login_at < (datetime.now() - timedelta(hours =24))).filter(Users.role != 'admin').all()
-    message = 'Hey! You are receiving this email since you haven\'t logged into AdVeri for the past 24 hours. Check in to see your progress in your ventures!'
-    for user in inactive_users:
-        html = render_template('daily_reminder.html', user = user, message = message)
-        send_email(user.email, 'Login to Adveri!', html)
-    return f'Login reminder sent to {len(inactive_users)} users.'
-
-@celery.task
-def send_monthly_email():
-    sponsors = Users.query.filter_by(role = 'sponsor').all()
-    one_month_ago = datetime.now() - timedelta(days = 30)
-
-    for sponsor in sponsors:
-        campaigns = Campaigns.query.filter_by(sponsor_id = sponsor.id).filter_by(Campaigns.start_date < one_month_ago).all()
-        campaign_details = []
-        total_reach = 0
-        expenditure = 0
-
-        for campaign in campaigns:
-            expenditure = db.session.query(func.sum(AdRequests.payment_amount)).filter(AdRequests.campaign_id == campaign.id).scalar()
-
-            campaign_details.append({
-                'name': campaign.name,
-                'description': campaign.description,
-                'start_date': campaign.start_date,
-                'end_date': campaign.end_date,
-                'budget': campaign.budget,
-                'visibility': campaign.visibility,
-                'goals': campaign.goals,
-                'campaign_reach': campaign.campaign_reach,
-                'goals_met': campaign.goals_met,
-                'expenditure': expenditure
-
-            })
-
-        html = render_template('monthly_report.html', user = sponsor, campaign_details = campaign_details)
-        send_email(sponsor.eamil, 'Monthly Report', html)
-    return f'Monthly report sent to {len(sponsors)} users.'
\ No newline at end of file
+    '''
+    Pages through inactive users by id and fans the reminders out as one
+    send_reminder_chunk subtask per batch; summarize_reminders adds up the
+    chunk results once every chunk has finished.
+    '''
+    # last_login_at is written behind by the web workers, so it may lag by up to
+    # LAST_LOGIN_FLUSH_INTERVAL seconds; negligible against the 24 hour cutoff.
+    cutoff = datetime.now() - timedelta(hours =24)
+    chunk_size = current_app.config.get('REMINDER_CHUNK_SIZE', 200)
+    chunks = [send_reminder_chunk.s(ids) for ids in inactive_user_ids(cutoff, chunk_size)]
+    if not chunks:
+        return 'Login reminder sent to 0 users.'
+    chord(chunks)(summarize_reminders.s())
+    return f'Login reminders queued in {len(chunks)} chunks of up to {chunk_size} users.'
+
+@celery.task(bind = True, max_retries = 3, default_retry_delay = 60)
+def send_reminder_chunk(self, user_ids, sent = 0):
+    '''
+    Sends the reminders for one chunk. Only the recipients that failed are
+    retried, so a retry never mails anyone twice.
+    '''
+    users = db.session.execute(select(Users.id, Users.username, Users.email).where(Users.id.in_(user_ids))).all()
+    ids_by_email = {user.email: user.id for user in users}
+    template = daily_reminder(REMINDER_MESSAGE)
+    messages = ((user.email, 'Login to Adveri!', template.render(user = user)) for user in users)
+    delivered, failed_emails = send_batch(messages)
+    sent += delivered
+    failed = [ids_by_email[email] for email in failed_emails]
+
+    if failed:
+        try:
+            raise self.retry(args = (failed,), kwargs = {'sent': sent})
+        except MaxRetriesExceededError:
+            pass
+    return {'sent': sent, 'failed': len(failed)}
+
+@celery.task
+def summarize_reminders(results):
+    sent = sum(result['sent'] for result in results)
+    failed = sum(result['failed'] for result in results)
+    return f'Login reminder sent to {sent} users, {failed} failed, in {len(results)} chunks.'
+
+@celery.task
+def send_monthly_email(period = None, resend_stale = False):
+    '''
+    Splits the sponsors into id-range shards and sends each shard's reports
+    in its own subtask. Checkpoints per (sponsor, period) make rerunning
+    this for the same month resume instead of re-emailing anyone;
+    resend_stale first releases reports left claimed by a crashed run.
+    '''
+    period = period or datetime.now().strftime('%Y-%m')
+    if resend_stale:
+        release_stale_claims(period, current_app.config['REPORT_CLAIM_TIMEOUT'])
+    shard_size = current_app.config.get('REPORT_SHARD_SIZE', 100)
+    shards = [send_monthly_shard.s(period, first_id, last_id) for first_id, last_id in sponsor_shards(shard_size)]
+    if not shards:
+        return 'Monthly report sent to 0 users.'
+    chord(shards)(summarize_monthly_reports.s(period))
+    return f'Monthly reports for {period} queued in {len(shards)} shards.'
+
+@celery.task(bind = True, max_retries = 3, default_retry_delay = 60)
+def send_monthly_shard(self, period, first_id, last_id):
+    try:
+        return send_shard(period, first_id, last_id)
+    except Exception as e:
+        if self.request.retries < self.max_retries:
+            # Safe to rerun: sponsors already checkpointed are skipped.
+            raise self.retry(exc = e)
+        # Giving up still completes the chord; the summary counts the shard's
+        # sponsors as unsent from the checkpoint table.
+        return {'sent': 0, 'skipped': 0, 'failed': 0, 'stale': 0, 'error': f'{first_id}-{last_id}: {e}'}
+
+@celery.task
+def summarize_monthly_reports(results, period):
+    sent, skipped, failed = (sum(result[key] for result in results) for key in ('sent', 'skipped', 'failed'))
+    errors = [result['error'] for result in results if result.get('error')]
+    status = report_status(period, current_app.config['REPORT_CLAIM_TIMEOUT'])
+    summary = (f'Monthly report for {period} sent to {sent} users, {skipped} already sent, {failed} failed, '
+               f'in {len(results)} shards ({len(errors)} gave up). For the month: {status["sent"]} sent, '
+               f'{status["unsent"]} not sent yet.')
+    if status['stale']:
+        summary += f' {status["stale"]} reports were claimed but never sent; rerun with resend_stale = True to send them.'
+    return summary
+
+@celery.task
+def rollup_earnings_ledger():
+    compacted = rollup_ledger(current_app.config.get('EARNINGS_LEDGER_RETENTION_DAYS', 30))
+    return f'Compacted {compacted} earnings ledger entries.'
+
+@celery.task
+def export_data(job_id):
+    rows = run_export(job_id, current_app.config['EXPORT_DIR'])
+    return f'Export {job_id} finished with {rows} rows.'
+
+@celery.task
+def purge_old_exports():
+    purged = purge_exports(current_app.config.get('EXPORT_RETENTION_HOURS', 24))
+    return f'Purged {purged} exports.'
+
+@celery.task
+def render_admin_charts():
+    rendered = render_charts(current_app.config['CHART_DIR'])
+    return f'Rendered charts: {", ".join(rendered)}.' if rendered else 'Charts are up to date.'
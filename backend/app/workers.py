@@ -1,9 +1,53 @@
-from celery import Celery
-from flask import current_app as app
+import threading
+from celery import Celery, Task
+from celery.signals import worker_process_init
+from flask import has_app_context
+from .config import Config
+from .extensions import db
 
-celery = Celery('Backend Jobs')
+_worker_app = None
+_worker_app_lock = threading.Lock()
+_local = threading.local()
 
-class ContextTask(celery.Task):
+def get_worker_app():
+    '''The Flask app for this worker process, built once on first use.'''
+    global _worker_app
+    with _worker_app_lock:
+        if _worker_app is None:
+            from . import create_app
+            _worker_app = create_app()
+        return _worker_app
+
+@worker_process_init.connect
+def init_worker_process(**kwargs):
+    '''
+    Runs in every prefork child. An app inherited from the parent has
+    pooled connections that belong to the parent, so they are dropped
+    (without closing the parent's sockets); otherwise the app is built here
+    rather than on the first task.
+    '''
+    if _worker_app is not None:
+        with _worker_app.app_context():
+            db.engine.dispose(close = False)
+    get_worker_app()
+
+class ContextTask(Task):
+    '''
+    Runs tasks in a worker-lifetime app context, pushed once per worker
+    thread, so the app and its engine pool are reused across tasks; only the
+    scoped session is closed after each task. A task called eagerly from
+    inside a request runs in that request's context instead.
+    '''
     def __call__(self, *args, **kwargs):
-        with app.app_context():
-            return self.run(*args, **kwargs)
\ No newline at end of file
+        if has_app_context() and getattr(_local, 'context', None) is None:
+            return self.run(*args, **kwargs)
+        if getattr(_local, 'context', None) is None:
+            _local.context = get_worker_app().app_context()
+            _local.context.push()
+        try:
+            return self.run(*args, **kwargs)
+        finally:
+            db.session.remove()
+
+celery = Celery('Backend Jobs', task_cls = ContextTask, broker = Config.CELERY_BROKER_URL,
+                backend = Config.CELERY_RESULT_BACKEND)
@@ -0,0 +1,60 @@
+'''
+Tasks per second for a no-op and a DB-touching task: the previous
+ContextTask, which set up the app (create_app(), a fresh engine and pool, an
+app context) for every call, versus the worker-lifetime context that only
+closes the scoped session per task.
+
+    DATABASE_URI=sqlite:////tmp/bench.db python -m benchmarks.celery_tasks --count 5000 --baseline-count 200
+
+Tasks are run in-process through Task.apply(), which goes through the same
+task __call__ as a worker without needing a broker.
+'''
+import argparse
+import time
+from celery import Celery, Task
+from sqlalchemy import func, select
+from app import create_app
+from app.extensions import db
+from app.models import Users
+from app.workers import celery, get_worker_app
+
+legacy = Celery('Legacy Jobs')
+
+class PerCallContextTask(Task):
+    def __call__(self, *args, **kwargs):
+        with create_app().app_context():
+            try:
+                return self.run(*args, **kwargs)
+            finally:
+                # Each app has its own engine; close it so the run does not leak connections.
+                db.engine.dispose()
+
+def noop():
+    return None
+
+def count_users():
+    return db.session.scalar(select(func.count(Users.id)))
+
+def run(label, task, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        task.apply()
+    elapsed = time.perf_counter() - start
+    print(f'{label:<40} {count:>7} tasks  {elapsed:7.2f}s  {count / elapsed:10.1f} tasks/s')
+
+def main():
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type = int, default = 5000)
+    parser.add_argument('--baseline-count', type = int, default = 200,
+                        help = 'tasks for the per-call baseline, which is far slower')
+    args = parser.parse_args()
+
+    get_worker_app()
+    for name, fn in (('noop', noop), ('count_users', count_users)):
+        before = legacy.task(fn, name = f'legacy.{name}', base = PerCallContextTask)
+        after = celery.task(fn, name = f'bench.{name}')
+        run(f'{name}: app and context per task', before, args.baseline_count)
+        run(f'{name}: worker-lifetime context', after, args.count)
+
+if __name__ == '__main__':
+    main()
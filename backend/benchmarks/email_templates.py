@@ -0,0 +1,45 @@
+'''
+Renders per second for the reminder and report emails: render_template on
+every recipient versus the per-worker precompiled templates.
+
+    python -m benchmarks.email_templates --count 5000 --campaigns 5
+'''
+import argparse
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from flask import Flask, render_template
+from app.email_templates import daily_reminder, monthly_report
+from app.tasks import REMINDER_MESSAGE
+
+def run(label, render, count):
+    start = time.perf_counter()
+    for i in range(count):
+        render(i)
+    elapsed = time.perf_counter() - start
+    print(f'{label:<32} {count:>7} renders  {elapsed:7.2f}s  {count / elapsed:10.1f} renders/s')
+
+def main():
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type = int, default = 5000)
+    parser.add_argument('--campaigns', type = int, default = 5, help = 'campaigns per monthly report')
+    args = parser.parse_args()
+
+    users = [SimpleNamespace(username = f'user{i}', email = f'user{i}@example.com', entity_name = f'Sponsor {i} & Co')
+             for i in range(100)]
+    start = datetime(2026, 1, 1)
+    campaigns = [{'name': f'Campaign {i}', 'description': 'Spring <launch>', 'start_date': start,
+                  'end_date': start + timedelta(days = 30), 'budget': 5000.0, 'visibility': 'public', 'goals': 'Reach',
+                  'campaign_reach': 1000 * i, 'goals_met': None, 'expenditure': 1200.0} for i in range(args.campaigns)]
+
+    app = Flask('app')
+    with app.app_context():
+        run('daily: render_template', lambda i: render_template('daily_reminder.html', user = users[i % 100],
+                                                                message = REMINDER_MESSAGE), args.count)
+        run('daily: precompiled', lambda i: daily_reminder(REMINDER_MESSAGE).render(user = users[i % 100]), args.count)
+        run('monthly: render_template', lambda i: render_template('monthly_report.html', user = users[i % 100],
+                                                                  campaign_details = campaigns), args.count)
+        run('monthly: precompiled', lambda i: monthly_report().render(campaigns, user = users[i % 100]), args.count)
+
+if __name__ == '__main__':
+    main()
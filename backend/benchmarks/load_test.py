@@ -0,0 +1,152 @@
+'''
+Requests per second against the Werkzeug dev server (run.py) and gunicorn
+(gunicorn.conf.py) serving the same app on the same paths.
+
+    DATABASE_URI=sqlite:////tmp/load.db python -m benchmarks.load_test --concurrency 32 --duration 10
+
+The database is seeded with --campaigns campaigns if it has none, and every
+request carries an admin access token, so authenticated endpoints such as
+/campaigns/search can be benchmarked. Each server is started as a subprocess
+on a free port; every client thread keeps one HTTP/1.1 connection open and
+sends requests back to back. Responses with a 4xx/5xx status count as errors.
+'''
+import argparse
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WORDS = ('summer', 'fitness', 'tech', 'launch', 'beauty', 'travel', 'gaming', 'food', 'winter', 'promo')
+
+def prepare(campaigns):
+    '''Seeds campaigns into an empty database and returns an admin access token.'''
+    sys.path.insert(0, BACKEND)
+    from flask_jwt_extended import create_access_token
+    from sqlalchemy import func, insert, select
+    from app import create_app
+    from app.extensions import db
+    from app.models import Users, Campaigns
+
+    app = create_app()
+    with app.app_context():
+        if not db.session.scalar(select(func.count(Campaigns.id))):
+            now = datetime.now()
+            db.session.execute(insert(Campaigns), [{
+                'name': f'{WORDS[i % 10]} {WORDS[i // 10 % 10]} campaign {i}', 'description': f'{WORDS[i * 7 % 10]} audience',
+                'start_date': now - timedelta(days = i % 30), 'end_date': now + timedelta(days = 30 - i % 30),
+                'budget': 1000, 'goals': 10, 'visibility': 'public'} for i in range(campaigns)])
+            db.session.commit()
+        admin = db.session.execute(select(Users.id, Users.role).where(Users.role == 'admin')).first()
+        return create_access_token(identity = {'id': admin.id, 'role': admin.role, 'approved': True},
+                                   expires_delta = False)
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def server_command(target, port, workers):
+    if target == 'dev':
+        return [sys.executable, '-c', f'import run; run.app.run(port = {port}, debug = False, threaded = True)']
+    command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{port}',
+               '--access-logfile', '/dev/null']
+    if workers:
+        command += ['--workers', str(workers)]
+    return command + ['wsgi:app']
+
+def wait_until_listening(port, process, timeout = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('The server exited during startup.')
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout = 0.2).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError('The server did not start listening in time.')
+
+def client(port, paths, headers, deadline, results):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout = 10)
+    latencies, errors, i = [], 0, 0
+    while time.monotonic() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        start = time.perf_counter()
+        for attempt in (1, 2):
+            try:
+                connection.request('GET', path, headers = headers)
+                response = connection.getresponse()
+                response.read()
+                if response.will_close:
+                    connection.close()
+                if response.status >= 400:
+                    errors += 1
+                else:
+                    latencies.append(time.perf_counter() - start)
+                break
+            except (OSError, http.client.HTTPException):
+                # A kept-alive connection may be closed by the server (keepalive
+                # timeout, worker recycling); clients retry those once.
+                connection.close()
+                if attempt == 2:
+                    errors += 1
+    connection.close()
+    results.append((latencies, errors))
+
+def load(port, paths, headers, concurrency, duration):
+    results = []
+    deadline = time.monotonic() + duration
+    threads = [threading.Thread(target = client, args = (port, paths, headers, deadline, results))
+               for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    latencies = sorted(latency for thread_latencies, _ in results for latency in thread_latencies)
+    errors = sum(thread_errors for _, thread_errors in results)
+    return latencies, errors
+
+def report(label, latencies, errors, duration):
+    if not latencies:
+        print(f'{label:<10} no successful responses, {errors} errors')
+        return
+    percentile = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+    print(f'{label:<10} {len(latencies) / duration:10.1f} req/s  p50 {percentile(0.5):7.2f}ms  '
+          f'p99 {percentile(0.99):7.2f}ms  errors {errors}')
+
+def main():
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--path', action = 'append', dest = 'paths',
+                        help = 'path to request, repeatable (default / and a few /campaigns/search queries)')
+    parser.add_argument('--campaigns', type = int, default = 2000, help = 'campaigns to seed into an empty database')
+    parser.add_argument('--concurrency', type = int, default = 32)
+    parser.add_argument('--duration', type = float, default = 10)
+    parser.add_argument('--workers', type = int, help = 'override the gunicorn worker count')
+    parser.add_argument('--target', choices = ('dev', 'gunicorn', 'both'), default = 'both')
+    args = parser.parse_args()
+    paths = args.paths or ['/', '/campaigns/search?q=summer', '/campaigns/search?q=fitness+camp',
+                           '/campaigns/search?q=tech&limit=50']
+    headers = {'Authorization': f'Bearer {prepare(args.campaigns)}'}
+
+    for target in (('dev', 'gunicorn') if args.target == 'both' else (args.target,)):
+        port = free_port()
+        process = subprocess.Popen(server_command(target, port, args.workers), cwd = BACKEND,
+                                   stdout = subprocess.DEVNULL, stderr = subprocess.DEVNULL)
+        try:
+            wait_until_listening(port, process)
+            load(port, paths, headers, min(args.concurrency, 4), 1)  # warm up
+            latencies, errors = load(port, paths, headers, args.concurrency, args.duration)
+            report(target, latencies, errors, args.duration)
+        finally:
+            process.terminate()
+            process.wait(timeout = 30)
+
+if __name__ == '__main__':
+    main()
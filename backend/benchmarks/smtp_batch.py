@@ -0,0 +1,94 @@
+'''
+Messages per second through mailer.send_email (one SMTP connection per
+email) versus mailer.send_batch (pooled connection).
+
+    python -m benchmarks.smtp_batch --count 500 --latency 5
+
+By default a local sink SMTP server is started in-process; --latency adds a
+delay before every reply to stand in for the network round trip to a real
+relay. Pass --server host:port to point at another debugging server instead
+(e.g. `python -m aiosmtpd -n -l localhost:8025`).
+'''
+import argparse
+import socketserver
+import threading
+import time
+from flask import Flask
+from app.config import Config
+from app.extensions import mail
+from app import mailer
+
+class SinkHandler(socketserver.StreamRequestHandler):
+    '''Just enough SMTP to accept and discard messages.'''
+    latency = 0
+
+    def reply(self, line):
+        if self.latency:
+            time.sleep(self.latency)
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        self.reply('220 sink ready')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line[:4].upper()
+            if command in (b'EHLO', b'HELO'):
+                self.reply('250 sink')
+            elif command == b'DATA':
+                self.reply('354 go ahead')
+                while self.rfile.readline() not in (b'.\r\n', b''):
+                    pass
+                self.reply('250 queued')
+            elif command == b'QUIT':
+                self.reply('221 bye')
+                return
+            else:
+                self.reply('250 ok')
+
+class SinkServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+def make_app(host, port):
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config.update(MAIL_SERVER = host, MAIL_PORT = port, MAIL_USE_TLS = False, MAIL_USE_SSL = False,
+                      MAIL_USERNAME = None, MAIL_PASSWORD = None)
+    mail.init_app(app)
+    mailer.init_app(app)
+    return app
+
+def run(label, send, count):
+    start = time.perf_counter()
+    send(count)
+    elapsed = time.perf_counter() - start
+    print(f'{label:<28} {count:>6} messages  {elapsed:8.2f}s  {count / elapsed:10.1f} msg/s')
+
+def main():
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type = int, default = 500)
+    parser.add_argument('--latency', type = float, default = 0, help = 'milliseconds added to every sink reply')
+    parser.add_argument('--server', help = 'host:port of an external debugging SMTP server')
+    args = parser.parse_args()
+
+    if args.server:
+        host, port = args.server.rsplit(':', 1)
+        port = int(port)
+    else:
+        SinkHandler.latency = args.latency / 1000
+        server = SinkServer(('127.0.0.1', 0), SinkHandler)
+        threading.Thread(target = server.serve_forever, daemon = True).start()
+        host, port = server.server_address
+
+    body = '<p>Hey! Check in to see your progress in your ventures!</p>'
+    with make_app(host, port).app_context():
+        run('send_email (per message)', lambda n: [mailer.send_email(f'user{i}@example.com', 'Login to Adveri!', body)
+                                                   for i in range(n)], args.count)
+        run('send_batch (pooled)', lambda n: mailer.send_batch((f'user{i}@example.com', 'Login to Adveri!', body)
+                                                               for i in range(n)), args.count)
+        mailer.smtp_pool.close_all()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+'''
+Production serving: gunicorn -c gunicorn.conf.py wsgi:app
+
+The app is imported once in the master and forked into the workers, so they
+start fast and share its memory copy-on-write. A code change therefore needs
+a full restart; HUP only recycles the workers on the already loaded code.
+'''
+import multiprocessing
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+preload_app = True
+
+# Requests mostly wait on the database, SMTP or the bcrypt pool, so each
+# process serves several at once on threads; the process count follows the cores.
+worker_class = 'gthread'
+workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+# Recycle workers now and then so slow leaks never pile up; the jitter keeps
+# them from all restarting at once.
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+accesslog = os.getenv('GUNICORN_ACCESSLOG', '-')
+errorlog = '-'
+
+def post_fork(server, worker):
+    # Connections the master opened while building the app (create_all,
+    # the admin user) must not be shared with the workers. close = False
+    # leaves the master's sockets alone and just forgets them here.
+    from wsgi import app
+    from app.extensions import db
+    with app.app_context():
+        db.engine.dispose(close = False)
@@ -0,0 +1,4 @@
+from app import create_app
+
+# Built once in the gunicorn master (preload_app) and inherited by every worker.
+app = create_app()